@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Benchmark Fixtures - Synthetic inputs for the ops script benchmarks
+
+Builds the inputs the scripts normally get from the outside world:
+- git repositories with N tags and M commits (written with one
+  `git fast-import` call, so large histories take seconds)
+- content/generated trees with thousands of cost JSON files, and cost
+  ledgers with the same number of records
+- pull request data as returned by get_pr_info
+- a local HTTP server that answers the OpenAI and GitHub API calls the
+  scripts make, so they can run end to end without network access
+"""
+
+import os
+import json
+import base64
+import random
+import subprocess
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# Commit subjects cycle through these so every changelog category is used
+COMMIT_SUBJECTS = [
+    "feat: add {thing}",
+    "fix: resolve crash in {thing}",
+    "docs: document {thing}",
+    "refactor: simplify {thing}",
+    "chore: bump {thing} dependencies",
+    "Improve {thing} performance",
+    "Remove unused {thing} code",
+    "security: patch {thing} vulnerability",
+    "test: cover {thing}",
+    "Update {thing}",
+]
+
+THINGS = ['study rooms', 'flashcards', 'calendar', 'notifications', 'search', 'profile page', 'chat', 'billing']
+
+AUTHORS = [('Ada Lovelace', 'ada@example.com'), ('Alan Turing', 'alan@example.com'), ('Grace Hopper', 'grace@example.com')]
+
+CONTENT_TYPES = ['blog', 'spec', 'image', 'video', 'social', 'research', 'proposal']
+
+AI_MODELS = ['gpt-4-turbo', 'claude-opus', 'perplexity-pro', 'dalle3-hd']
+
+# GitHub login of the token the fake API is called with (the Actions
+# GITHUB_TOKEN's, reviewer.REVIEWER_BOT_LOGIN's default)
+BOT_LOGIN = 'github-actions[bot]'
+
+# Start of the synthetic git history (commits are one hour apart)
+HISTORY_START = datetime(2024, 1, 1)
+
+
+def _data(text: str) -> bytes:
+    """Encode a fast-import `data` command"""
+    payload = text.encode('utf-8')
+    return b'data %d\n%s\n' % (len(payload), payload)
+
+
+def make_git_repo(path: Path, tags: int, commits: int, files: int = 50, seed: int = 0) -> Path:
+    """
+    Create a git repository with `commits` commits on main and `tags`
+    lightweight tags (v1.0.0, v1.1.0, ...) spread evenly over the history.
+
+    Each commit rewrites one of `files` source files. Commits after the last
+    tag are left unreleased.
+    """
+    rng = random.Random(seed)
+    path.mkdir(parents=True, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', '-b', 'main', str(path)], check=True)
+
+    # Leave a few commits after the last tag for the Unreleased section
+    step = max(1, (commits - 1) // max(1, tags)) if tags else 0
+    tag_marks = {step * (i + 1): f"v1.{i}.0" for i in range(tags)} if tags else {}
+
+    stream = bytearray()
+    for i in range(1, commits + 1):
+        name, email = AUTHORS[i % len(AUTHORS)]
+        timestamp = int((HISTORY_START + timedelta(hours=i)).timestamp())
+        subject = COMMIT_SUBJECTS[i % len(COMMIT_SUBJECTS)].format(thing=rng.choice(THINGS))
+        body = "BREAKING CHANGE: the old API is gone\n" if i % 97 == 0 else ""
+        message = f"{subject}\n\n{body}" if body else subject
+
+        stream += b'commit refs/heads/main\n'
+        stream += b'mark :%d\n' % i
+        stream += f"author {name} <{email}> {timestamp} +0000\n".encode('utf-8')
+        stream += f"committer {name} <{email}> {timestamp} +0000\n".encode('utf-8')
+        stream += _data(message)
+        if i > 1:
+            stream += b'from :%d\n' % (i - 1)
+        content = '\n'.join(f"line {j} of commit {i}" for j in range(rng.randint(1, 40)))
+        stream += f"M 100644 inline src/module_{i % files}.py\n".encode('utf-8')
+        stream += _data(content)
+
+        if i in tag_marks:
+            stream += f"reset refs/tags/{tag_marks[i]}\nfrom :{i}\n\n".encode('utf-8')
+
+    subprocess.run(['git', 'fast-import', '--quiet'], input=bytes(stream), cwd=path, check=True)
+    subprocess.run(['git', 'checkout', '-q', 'main'], cwd=path, check=True)
+    return path
+
+
+def make_commits(count: int, seed: int = 0) -> list:
+    """
+    Create commit dicts shaped like commit index entries (see
+    git_history.iter_commits with_parents and with_stat), newest first.
+    """
+    rng = random.Random(seed)
+    commits = []
+    for i in range(count, 0, -1):
+        name, _ = AUTHORS[i % len(AUTHORS)]
+        subject = COMMIT_SUBJECTS[i % len(COMMIT_SUBJECTS)].format(thing=rng.choice(THINGS))
+        # Same timestamps as make_git_repo, which commits in UTC
+        timestamp = int((HISTORY_START + timedelta(hours=i)).timestamp())
+        insertions, deletions = rng.randint(1, 40), rng.randint(0, 40)
+        commits.append({
+            'hash': f"{i:040x}",
+            'date': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+            'author': name,
+            'subject': subject,
+            'body': "BREAKING CHANGE: the old API is gone" if i % 97 == 0 else "",
+            'parents': [f"{i - 1:040x}"] if i > 1 else [],
+            'timestamp': timestamp,
+            'files': [f"src/module_{i % 50}.py"],
+            'numstat': [insertions, deletions],
+            'stat': [1, insertions, deletions],
+        })
+    return commits
+
+
+def make_generated_tree(root: Path, files: int, seed: int = 0) -> Path:
+    """
+    Create content/generated, specs and sales directories under root with
+    `files` cost JSON files in total, shaped like the generators' output.
+
+    Modification times are spread over the last 60 days. Every fiftieth
+    file embeds 256 KB of base64 audio, and every fourth file has only its
+    cost fields, after the content, like artifacts written before the
+    generators put their metadata first.
+    """
+    rng = random.Random(seed)
+    now = datetime.now().timestamp()
+    directories = [root / 'content' / 'generated', root / 'specs', root / 'sales']
+    for i in range(files):
+        content_type = CONTENT_TYPES[i % len(CONTENT_TYPES)]
+        directory = directories[0] if i % 5 else directories[1 + i % 2]
+        file_path = directory / f"2024-{i % 12 + 1:02d}" / f"{content_type}_{i}.json"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tokens_in, tokens_out = rng.randint(100, 4000), rng.randint(100, 8000)
+        cost_fields = {'cost': round(rng.uniform(0.01, 2.0), 4), 'ai': rng.choice(AI_MODELS)}
+        body = {
+            'content': {'headline': f"Headline {i}", 'body': "Lorem ipsum dolor sit amet. " * rng.randint(10, 200)},
+            'usage': {'prompt_tokens': tokens_in, 'completion_tokens': tokens_out},
+        }
+        if i % 50 == 0:
+            # Audio and image artifacts embed their data
+            body['audio_data'] = base64.b64encode(rng.randbytes(192 * 1024)).decode('ascii')
+        if i % 4 == 0:
+            # Older artifacts have the cost fields after the content
+            data = {**body, **cost_fields}
+        else:
+            header = {
+                'content_type': content_type,
+                'tokens_in': tokens_in,
+                'tokens_out': tokens_out,
+                'latency': round(rng.uniform(2, 60), 3),
+            }
+            data = {**header, **cost_fields, **body}
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        mtime = now - rng.uniform(0, 60 * 24 * 3600)
+        os.utime(file_path, (mtime, mtime))
+    return root
+
+
+def make_cost_ledger(path: Path, records: int, seed: int = 0) -> Path:
+    """Create a cost ledger with `records` records spread over the last 60 days, oldest first"""
+    rng = random.Random(seed)
+    now = datetime.now().timestamp()
+    times = sorted(now - rng.uniform(0, 60 * 24 * 3600) for _ in range(records))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for timestamp in times:
+            record = {
+                'time': round(timestamp, 3),
+                'type': rng.choice(CONTENT_TYPES),
+                'ai': rng.choice(AI_MODELS),
+                'cost': round(rng.uniform(0.01, 2.0), 6),
+                'tokens_in': rng.randint(100, 4000),
+                'tokens_out': rng.randint(100, 8000),
+                'latency': round(rng.uniform(2, 60), 3),
+                'retries': 1 if rng.random() < 0.05 else 0,
+                'source': 'content_generator',
+            }
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    return path
+
+
+def make_patch(lines: int, seed: int = 0, hunk_lines: int = 20) -> str:
+    """Create a unified diff with roughly `lines` changed lines, in hunks of hunk_lines"""
+    rng = random.Random(seed)
+    patch = []
+    for j in range(lines):
+        if j % hunk_lines == 0:
+            start = j * 3 + 1
+            patch.append(f"@@ -{start},{hunk_lines} +{start},{hunk_lines} @@")
+        sign = rng.choice('+- ')
+        patch.append(f"{sign}    value_{j} = compute(value_{j - 1}, {rng.randint(0, 999)})")
+    return '\n'.join(patch)
+
+
+def make_pr_files(count: int, patch_lines: int = 40, seed: int = 0) -> list:
+    """Create the changed files of a pull request, shaped like get_pr_info's files_changed"""
+    paths = [
+        "src/components/Component{i}.tsx",
+        "src/app/api/rooms/route{i}.ts",
+        "src/components/Panel{i}.tsx",
+        "ops/scripts/module_{i}.py",
+        "drizzle/{i:04d}_schedule.sql",
+        "docs/guide_{i}.md",
+    ]
+    files = []
+    for i in range(count):
+        binary = i % 25 == 24
+        # Lockfile changes dwarf the code changes of a PR
+        lockfile = i == 0
+        lines = patch_lines * 20 if lockfile else patch_lines
+        files.append({
+            'filename': "package-lock.json" if lockfile else paths[i % len(paths)].format(i=i),
+            'status': 'modified' if i % 7 else 'added',
+            'additions': lines // 2,
+            'deletions': lines // 2,
+            'changes': lines,
+            'patch': None if binary else make_patch(lines, seed + i),
+        })
+    return files
+
+
+def make_pr_info(files: int, patch_lines: int = 40, seed: int = 0) -> dict:
+    """Create pull request information shaped like get_pr_info's result"""
+    files_changed = make_pr_files(files, patch_lines, seed)
+    return {
+        'number': 123,
+        'title': 'Add study room scheduling',
+        'body': 'Adds scheduling to study rooms.\n\n' * 5,
+        'labels': ['needs-review', 'feature'],
+        'author': 'ada',
+        'created_at': '2024-01-01T00:00:00',
+        'updated_at': '2024-01-02T00:00:00',
+        'url': 'https://github.com/brock-nelson/costudy-website/pull/123',
+        'base_branch': 'main',
+        'head_branch': 'feature/scheduling',
+        'head_sha': random.Random(seed).getrandbits(160).to_bytes(20, 'big').hex(),
+        'files_changed': files_changed,
+        'additions': sum(f['additions'] for f in files_changed),
+        'deletions': sum(f['deletions'] for f in files_changed),
+        'changed_files_count': len(files_changed),
+    }
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Answers the OpenAI and GitHub API calls made by the ops scripts"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this every
+    # keep-alive response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status: int = 200, headers: dict = None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        path = urlparse(self.path).path
+        self.server.record(path)
+
+        parts = path.strip('/').split('/')
+        if len(parts) == 6 and parts[3] == 'issues' and parts[5] == 'comments':
+            comment = self.server.add_comment(request.get('body', ''))
+            self.send_json(comment, 201)
+        elif path == '/graphql':
+            self.send_json({'data': {'repository': {'pullRequest': self.server.pull_graphql()}}})
+        elif path.endswith('/chat/completions'):
+            content = json.dumps(self.server.completion)
+            self.send_json({
+                'id': 'chatcmpl-bench',
+                'object': 'chat.completion',
+                'created': 0,
+                'model': request.get('model', 'gpt-4o'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {'prompt_tokens': 1200, 'completion_tokens': 2400, 'total_tokens': 3600},
+            })
+        elif path.endswith('/images/generations'):
+            self.send_json({
+                'created': 0,
+                'data': [{'url': 'https://example.com/image.png', 'revised_prompt': request.get('prompt', '')}],
+            })
+        else:
+            self.send_json({'message': 'Not Found'}, 404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        self.server.record(url.path)
+        base = self.server.url
+
+        if parts == ['user']:
+            # Like the Actions GITHUB_TOKEN, an integration token
+            return self.send_json({'message': 'Resource not accessible by integration'}, 403)
+
+        # /repos/{owner}/{repo}[/pulls/{number}[/files]], /issues/{number}/comments, /compare/{base}...{head}
+        if len(parts) >= 3 and parts[0] == 'repos':
+            full_name = f"{parts[1]}/{parts[2]}"
+            repo_url = f"{base}/repos/{full_name}"
+            if len(parts) == 3:
+                return self.send_json({'id': 1, 'name': parts[2], 'full_name': full_name, 'url': repo_url})
+            if len(parts) == 5 and parts[3] == 'pulls':
+                return self.send_json(self.server.pull_json(repo_url, int(parts[4])))
+            if len(parts) == 6 and parts[3] == 'pulls' and parts[5] == 'files':
+                query = parse_qs(url.query)
+                page = int(query.get('page', ['1'])[0])
+                per_page = int(query.get('per_page', ['30'])[0])
+                files = self.server.pr_files[(page - 1) * per_page:page * per_page]
+                headers = {}
+                if page * per_page < len(self.server.pr_files):
+                    next_url = f"{base}{url.path}?page={page + 1}&per_page={per_page}"
+                    headers['Link'] = f'<{next_url}>; rel="next"'
+                return self.send_json(files, headers=headers)
+            if len(parts) == 6 and parts[3] == 'issues' and parts[5] == 'comments':
+                return self.send_json(self.server.comments)
+            if len(parts) == 5 and parts[3] == 'compare':
+                # Every head descends from every base by one commit; the
+                # last compare_files files changed
+                since, _, head = parts[4].partition('...')
+                return self.send_json({
+                    'status': 'ahead',
+                    'ahead_by': 1,
+                    'behind_by': 0,
+                    'total_commits': 1,
+                    'commits': [{'sha': head, 'url': f"{repo_url}/commits/{head}", 'parents': [{'sha': since, 'url': f"{repo_url}/commits/{since}"}]}],
+                    'files': self.server.pr_files[-self.server.compare_files:],
+                })
+        self.send_json({'message': 'Not Found'}, 404)
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    """
+    Local stand-in for api.openai.com and api.github.com.
+
+    Serves chat completions (always returning `completion` as JSON text),
+    image generations, and a repository with one pull request (over REST
+    and GraphQL) whose changed files are `pr_info['files_changed']`,
+    paginated like GitHub does. Issue comments posted are kept in
+    `comments` (all by the token's user, BOT_LOGIN; like an Actions token
+    it cannot read /user), and any two commits
+    compare as the last `compare_files` files changed. Every request path is counted in `requests`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, pr_info: dict = None, completion: dict = None, compare_files: int = 3):
+        super().__init__(('127.0.0.1', 0), FakeAPIHandler)
+        self.pr_info = pr_info or make_pr_info(10)
+        self.pr_files = self.pr_info['files_changed']
+        self.completion = completion or {'headline': 'Benchmark', 'body': 'Generated content. ' * 200}
+        self.compare_files = compare_files
+        self.comments = []
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def add_comment(self, body: str) -> dict:
+        with self._lock:
+            comment = {'id': len(self.comments) + 1, 'body': body, 'user': {'login': BOT_LOGIN, 'type': 'Bot'}}
+            self.comments.append(comment)
+        return comment
+
+    def pull_graphql(self) -> dict:
+        """Build the pull request of reviewer.PR_QUERY from pr_info"""
+        info = self.pr_info
+        return {
+            'number': info['number'],
+            'title': info['title'],
+            'body': info['body'],
+            'url': info['url'],
+            'createdAt': info['created_at'] + 'Z',
+            'updatedAt': info['updated_at'] + 'Z',
+            'additions': info['additions'],
+            'deletions': info['deletions'],
+            'changedFiles': info['changed_files_count'],
+            'author': {'login': info['author']},
+            'baseRefName': info['base_branch'],
+            'headRefName': info['head_branch'],
+            'headRefOid': info['head_sha'],
+            'labels': {'nodes': [{'name': name} for name in info['labels']]},
+        }
+
+    def pull_json(self, repo_url: str, number: int) -> dict:
+        """Build a GitHub pull request payload from pr_info"""
+        info = self.pr_info
+        return {
+            'id': number,
+            'number': number,
+            'url': f"{repo_url}/pulls/{number}",
+            'issue_url': f"{repo_url}/issues/{number}",
+            'html_url': info['url'],
+            'title': info['title'],
+            'body': info['body'],
+            'labels': [{'name': name} for name in info['labels']],
+            'user': {'login': info['author']},
+            'created_at': info['created_at'] + 'Z',
+            'updated_at': info['updated_at'] + 'Z',
+            'base': {'ref': info['base_branch']},
+            'head': {'ref': info['head_branch'], 'sha': info['head_sha']},
+            'additions': info['additions'],
+            'deletions': info['deletions'],
+            'changed_files': info['changed_files_count'],
+        }
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Benchmark Runner - Times the local hot paths of the ops scripts
+
+Runs every benchmark against synthetic inputs (see fixtures.py): a git
+repository with N tags and M commits, a content/generated tree with
+thousands of cost files, a cost ledger with as many records, and a local
+fake of the OpenAI and GitHub APIs.
+Results are written as JSON and can be compared with an earlier run to
+catch regressions.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --only changelog --repeat 10
+    python benchmarks/run_benchmarks.py --compare output/benchmarks/baseline.json
+"""
+
+import os
+import io
+import sys
+import json
+import click
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+from fixtures import FakeAPIServer, make_commits, make_cost_ledger, make_generated_tree, make_git_repo, make_pr_info
+
+# Paths
+BENCHMARKS_DIR = Path(__file__).parent
+SCRIPTS_DIR = BENCHMARKS_DIR.parent / "scripts"
+OUTPUT_DIR = BENCHMARKS_DIR.parent / "output" / "benchmarks"
+
+# Bump whenever the result file layout changes
+RESULTS_FORMAT = 1
+
+# Input sizes: (tags, commits, cost files, PR files)
+SIZES = {
+    'full': {'tags': 50, 'commits': 5000, 'cost_files': 5000, 'pr_files': 300},
+    'quick': {'tags': 10, 'commits': 500, 'cost_files': 500, 'pr_files': 50},
+}
+
+# Registered benchmarks, in the order they run: name -> setup function
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark; its setup function gets the context and returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@contextmanager
+def working_directory(path: Path):
+    """Run the scripts with path as the current directory (they read git and content relative to it)"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def run_main(main, argv: list):
+    """Call a script's main() with argv, treating a zero exit as success"""
+    saved = sys.argv
+    sys.argv = argv
+    try:
+        main()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise RuntimeError(f"{argv[0]} exited with {e.code}")
+    finally:
+        sys.argv = saved
+
+
+@benchmark('changelog.generate_full_changelog[cold]')
+def bench_changelog_cold(ctx):
+    import changelog
+
+    def run():
+        # No cached sections or release index: one load_history walk, every section rendered
+        with working_directory(ctx['repo']):
+            changelog.generate_full_changelog(cache_dir=None, index_path=None)
+    return run
+
+
+@benchmark('changelog.generate_full_changelog[warm]')
+def bench_changelog_warm(ctx):
+    import changelog
+
+    state = ctx['tmp'] / 'changelog-state'
+    cache_dir = state / 'changelog-cache'
+    release_index = state / 'release-index.json'
+
+    def run():
+        # Sections and release index from the previous run are reused
+        with working_directory(ctx['repo']):
+            changelog.generate_full_changelog(cache_dir=cache_dir, index_path=release_index)
+    run()
+    return run
+
+
+@benchmark('commit_index.query[cold]')
+def bench_commit_index_cold(ctx):
+    from commit_index import CommitIndex
+    to_ref = f"v1.{ctx['sizes']['tags'] - 1}.0"
+    from_ref = f"v1.{ctx['sizes']['tags'] - 2}.0"
+
+    def run():
+        # No index on disk, as on a fresh CI runner: one release range
+        with working_directory(ctx['repo']):
+            CommitIndex(None).query(from_ref, to_ref)
+    return run
+
+
+@benchmark('commit_index.query[warm]')
+def bench_commit_index_warm(ctx):
+    from commit_index import CommitIndex
+    index_path = ctx['tmp'] / 'query-state' / 'commit-index.jsonl'
+    to_ref = f"v1.{ctx['sizes']['tags'] - 1}.0"
+    from_ref = f"v1.{ctx['sizes']['tags'] - 2}.0"
+
+    def run():
+        # Same range as [cold], with the whole history already indexed
+        with working_directory(ctx['repo']):
+            CommitIndex(index_path).query(from_ref, to_ref)
+    with working_directory(ctx['repo']):
+        CommitIndex(index_path).query(None, 'HEAD')
+    return run
+
+
+@benchmark('marketing_pack.categorize_commits')
+def bench_categorize_commits(ctx):
+    import marketing_pack
+    commits = make_commits(ctx['sizes']['commits'])
+    return lambda: marketing_pack.categorize_commits(commits)
+
+
+@benchmark('commit_categories.categorize_batch[100k]')
+def bench_categorize_batch_100k(ctx):
+    from commit_categories import CHANGELOG_RULES, MARKETING_RULES, CommitCategorizer
+    # Fixed size regardless of --quick: the corpus the rule tables were measured on
+    commits = make_commits(100_000)
+    categorizers = [CommitCategorizer(CHANGELOG_RULES), CommitCategorizer(MARKETING_RULES)]
+
+    def run():
+        for categorizer in categorizers:
+            categorizer.categorize_batch(commits)
+    return run
+
+
+@benchmark('track_costs.main[scan]')
+def bench_track_costs_scan(ctx):
+    import track_costs
+    argv = ['track_costs.py', '--period', 'all', '--budget', '100', '--scan', '--no-index']
+
+    def run():
+        with working_directory(ctx['content']):
+            run_main(track_costs.main, argv)
+    return run
+
+
+@benchmark('track_costs.main[scan, 4 workers]')
+def bench_track_costs_workers(ctx):
+    import track_costs
+    argv = ['track_costs.py', '--period', 'all', '--budget', '100', '--scan', '--no-index', '--workers', '4']
+
+    def run():
+        with working_directory(ctx['content']):
+            run_main(track_costs.main, argv)
+    return run
+
+
+@benchmark('track_costs.main[scan, indexed]')
+def bench_track_costs_indexed(ctx):
+    import track_costs
+    argv = ['track_costs.py', '--period', 'all', '--budget', '100', '--scan', '--index', str(ctx['tmp'] / 'cost-index.json')]
+
+    def run():
+        # Unchanged tree: every file's cost comes from the index of the previous run
+        with working_directory(ctx['content']):
+            run_main(track_costs.main, argv)
+    return run
+
+
+@benchmark('track_costs.main[ledger]')
+def bench_track_costs_ledger(ctx):
+    import track_costs
+    argv = ['track_costs.py', '--period', 'all', '--budget', '100', '--ledger', str(ctx['ledger']), '--index', str(ctx['tmp'] / 'ledger-cost-index.json')]
+
+    def run():
+        with working_directory(ctx['content']):
+            run_main(track_costs.main, argv)
+    return run
+
+
+@benchmark('track_costs.main[ledger, by week]')
+def bench_track_costs_grouped(ctx):
+    import track_costs
+    argv = ['track_costs.py', '--since', '2020-01-01', '--group-by', 'week', '--ledger', str(ctx['ledger']), '--index', str(ctx['tmp'] / 'ledger-cost-index.json')]
+
+    def run():
+        with working_directory(ctx['content']):
+            run_main(track_costs.main, argv)
+    return run
+
+
+@benchmark('reviewer.format_pr_context')
+def bench_format_pr_context(ctx):
+    import reviewer
+    return lambda: reviewer.format_pr_context(ctx['pr_info'])
+
+
+@benchmark('reviewer.generate_review[sharded]')
+def bench_generate_review_sharded(ctx):
+    import reviewer
+    # A small budget so the quick PR is sharded too
+    return lambda: reviewer.generate_review(ctx['pr_info'], 'Review the code.', context_tokens=8000, jobs=4)
+
+
+@benchmark('response_cache.create_cached[hit]')
+def bench_response_cache_hit(ctx):
+    from openai import OpenAI
+    from response_cache import ResponseCache, create_cached
+    client = OpenAI()
+    cache = ResponseCache(ctx['tmp'] / 'response-cache')
+    params = {
+        'model': 'gpt-4o',
+        'messages': [{'role': 'user', 'content': 'Review the code.\n' + ctx['pr_info']['body']}],
+        'max_tokens': 4000,
+        'temperature': 0.3,
+    }
+    create_cached(client.chat.completions, cache, **params)
+    return lambda: create_cached(client.chat.completions, cache, **params).parse()
+
+
+@benchmark('reviewer.get_pr_info')
+def bench_get_pr_info(ctx):
+    import reviewer
+    return lambda: reviewer.get_pr_info(reviewer.GITHUB_REPO, ctx['pr_info']['number'])
+
+
+@benchmark('reviewer.get_changes_since')
+def bench_get_changes_since(ctx):
+    import reviewer
+    from github import Github
+
+    # An earlier review posted by the bot, as main() finds it on a re-run
+    since_sha = '0' * 40
+    ctx['server'].add_comment(reviewer.REVIEW_MARKER.format(sha=since_sha) + '\nEarlier review')
+    client = Github(reviewer.GITHUB_TOKEN, base_url=reviewer.GITHUB_API_URL, seconds_between_requests=0)
+    repo = client.get_repo(reviewer.GITHUB_REPO, lazy=True)
+    number = ctx['pr_info']['number']
+
+    def run():
+        last_sha = reviewer.get_last_reviewed_sha(repo, number)
+        if last_sha != since_sha or not reviewer.get_changes_since(repo, ctx['pr_info'], last_sha):
+            raise RuntimeError("incremental review fell back to a full review")
+    return run
+
+
+@benchmark('content_generator.main[blog]')
+def bench_content_generator(ctx):
+    import content_generator
+    output = ctx['tmp'] / 'blog_post.json'
+    argv = ['content_generator.py', 'blog', '--topic', 'Study Groups', '--keywords', 'study,groups', '--output', str(output)]
+    return lambda: run_main(content_generator.main, argv)
+
+
+@benchmark('ultimate_content_generator.main[blog]')
+def bench_ultimate_content_generator(ctx):
+    import ultimate_content_generator
+    output = ctx['tmp'] / 'blog.json'
+    argv = [
+        'ultimate_content_generator.py', 'blog', '--topic', 'Study Groups', '--keywords', 'study,groups',
+        '--ai', 'gpt-4-turbo', '--output', str(output),
+    ]
+    return lambda: run_main(ultimate_content_generator.main, argv)
+
+
+def time_benchmark(run, repeat: int, warmup: int = 1) -> dict:
+    """Time run() repeat times (after warmup untimed calls) and summarize in seconds"""
+    for _ in range(warmup):
+        run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def get_revision() -> str:
+    """Get the commit the benchmarked scripts come from (None outside git)"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=BENCHMARKS_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def compare_results(results: dict, baseline: dict, threshold: float) -> list:
+    """Get (name, baseline median, median, ratio) for benchmarks slower than baseline by more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old.get('median'):
+            continue
+        ratio = result['median'] / old['median']
+        if ratio > 1 + threshold:
+            regressions.append((name, old['median'], result['median'], ratio))
+    return regressions
+
+
+def save_results(data: dict, output_path: Path):
+    """Save benchmark results as JSON"""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+
+@click.command()
+@click.option('--quick', is_flag=True, help='Use small inputs (for a fast smoke run)')
+@click.option('--only', 'patterns', multiple=True, help='Only run benchmarks whose name contains this (repeatable)')
+@click.option('--repeat', '-r', default=5, type=int, help='Timed runs per benchmark (default: 5)')
+@click.option('--output', '-o', type=click.Path(), help='Results file (default: output/benchmarks/<timestamp>.json)')
+@click.option('--compare', type=click.Path(exists=True), help='Earlier results file to compare against')
+@click.option('--threshold', default=0.2, type=float, help='Slowdown that counts as a regression (default: 0.2 = 20%)')
+def main(quick: bool, patterns: tuple, repeat: int, output: str, compare: str, threshold: float):
+    """Benchmark the ops scripts against synthetic repositories, content trees and APIs"""
+    size_name = 'quick' if quick else 'full'
+    sizes = SIZES[size_name]
+    selected = [name for name in BENCHMARKS if not patterns or any(p in name for p in patterns)]
+    if not selected:
+        print(f"Error: No benchmark matches {', '.join(patterns)}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"⏱️  CoStudy Ops Benchmarks ({size_name})")
+    print(f"{'='*50}")
+    print()
+
+    with tempfile.TemporaryDirectory(prefix='ops-bench-') as tmp, \
+            FakeAPIServer(pr_info=make_pr_info(sizes['pr_files'])) as server:
+        tmp = Path(tmp)
+
+        # The scripts read their configuration when imported
+        os.environ.update({
+            'OPENAI_API_KEY': 'sk-bench',
+            'OPENAI_BASE_URL': f"{server.url}/v1",
+            'GITHUB_TOKEN': 'ghp-bench',
+            'GITHUB_API_URL': server.url,
+            'GITHUB_GRAPHQL_URL': '',
+            'ANTHROPIC_API_KEY': '',
+            'COST_LEDGER': str(tmp / 'generator-ledger.jsonl'),
+            # Time the API round trips, not cache hits (see response_cache.create_cached[hit])
+            'RESPONSE_CACHE_DIR': '',
+        })
+        sys.path.insert(0, str(SCRIPTS_DIR))
+
+        print(f"Creating git repository ({sizes['tags']} tags, {sizes['commits']} commits)...")
+        repo = make_git_repo(tmp / 'repo', sizes['tags'], sizes['commits'])
+        print(f"Creating content tree ({sizes['cost_files']} files)...")
+        content = make_generated_tree(tmp / 'content', sizes['cost_files'])
+        ledger = make_cost_ledger(tmp / 'cost-ledger.jsonl', sizes['cost_files'])
+        print()
+
+        ctx = {
+            'tmp': tmp,
+            'repo': repo,
+            'content': content,
+            'ledger': ledger,
+            'server': server,
+            'pr_info': server.pr_info,
+            'sizes': sizes,
+        }
+
+        results = {}
+        for name in selected:
+            log = io.StringIO()
+            with redirect_stdout(log):
+                run = BENCHMARKS[name](ctx)
+                result = time_benchmark(run, repeat)
+            results[name] = result
+            print(f"  {name:45} median {result['median'] * 1000:9.2f} ms  (min {result['min'] * 1000:.2f} ms)")
+        print()
+
+    data = {
+        'format': RESULTS_FORMAT,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'revision': get_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': size_name,
+        'sizes': sizes,
+        'results': results,
+    }
+    output_path = Path(output) if output else OUTPUT_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    save_results(data, output_path)
+    print(f"✓ Saved results to {output_path}")
+
+    if compare:
+        with open(compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('sizes') != sizes:
+            print(f"Warning: {compare} was run with different input sizes", file=sys.stderr)
+        regressions = compare_results(results, baseline, threshold)
+        print()
+        if regressions:
+            print(f"⚠️  {len(regressions)} regression(s) against {compare}:")
+            for name, old, new, ratio in regressions:
+                print(f"  {name}: {old * 1000:.2f} ms → {new * 1000:.2f} ms ({ratio:.2f}x)")
+            sys.exit(1)
+        print(f"✅ No regressions against {compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ Usage:
     python changelog.py --from v1.1.0 --to v1.2.0
     python changelog.py --version v1.2.0  # Compares with previous tag
     python changelog.py --all  # Generate full changelog from all tags
+    python changelog.py -v v1.2.0 -v v1.3.0 --jobs 4  # Several versions at once
+    python changelog.py --all --format json  # Machine-readable changelog
 """
 
 import os
@@ -13,9 +15,17 @@ import sys
 import click
 import subprocess
 import re
+import io
+import json
+import shutil
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
+from commit_categories import CHANGELOG_RULES, load_categorizer
+from commit_index import COMMIT_INDEX_PATH, CommitIndex
+from git_history import RELEASE_INDEX_PATH, get_tag_refs, load_history, load_release_index, save_release_index
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +34,38 @@ load_dotenv()
 SCRIPT_DIR = Path(__file__).parent
 OUTPUT_DIR = SCRIPT_DIR.parent / "output"
 REPO_ROOT = SCRIPT_DIR.parent.parent
+CACHE_DIR = OUTPUT_DIR / "changelog-cache"
+
+# Bump whenever the section format changes so that cached release sections
+# are rendered again (rule changes are picked up via CATEGORIZER.version)
+SECTION_FORMAT_VERSION = 1
+
+CHANGELOG_HEADER = """# Changelog
+
+All notable changes to this project will be documented in this file.
+
+The format is based on [Keep a Changelog](https://keepachangelog.com/en/1.0.0/),
+and this project adheres to [Semantic Versioning](https://semver.org/spec/v2.0.0.html).
+
+"""
+
+# Section headings in Keep a Changelog order
+SECTION_HEADINGS = [
+    ('breaking', "⚠️ Breaking Changes"),
+    ('security', "🔒 Security"),
+    ('added', "✨ Added"),
+    ('changed', "🔄 Changed"),
+    ('deprecated', "⚠️ Deprecated"),
+    ('removed', "🗑️ Removed"),
+    ('fixed', "🐛 Fixed"),
+]
+
+# Commit categorizer; replaced in main() when --categories is given
+CATEGORIZER = load_categorizer(os.getenv("CHANGELOG_CATEGORIES"), CHANGELOG_RULES)
+
+# Shared commit index; opened on first use, or in main() (in memory only
+# with --no-cache)
+COMMIT_INDEX = None
 
 
 def get_git_tags() -> list:
@@ -75,103 +117,33 @@ def get_tag_date(tag: str) -> str:
         return datetime.now().strftime('%Y-%m-%d')
 
 
-def get_commits_between(from_ref: str, to_ref: str) -> list:
-    """Get commits between two references"""
-    try:
-        cmd = [
-            'git', 'log',
-            f'{from_ref}..{to_ref}',
-            '--pretty=format:%H|%aI|%an|%s|%b',
-            '--no-merges'
-        ]
+def get_commit_index() -> CommitIndex:
+    """Get the shared commit index"""
+    global COMMIT_INDEX
+    if COMMIT_INDEX is None:
+        COMMIT_INDEX = CommitIndex(COMMIT_INDEX_PATH)
+    return COMMIT_INDEX
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
 
-        commits = []
-        current_commit = None
-
-        for line in result.stdout.split('\n'):
-            if '|' in line and line.count('|') >= 3:
-                # New commit
-                if current_commit:
-                    commits.append(current_commit)
-
-                parts = line.split('|', 4)
-                current_commit = {
-                    'hash': parts[0],
-                    'date': parts[1],
-                    'author': parts[2],
-                    'subject': parts[3],
-                    'body': parts[4] if len(parts) > 4 else '',
-                }
-            elif current_commit:
-                # Continuation of body
-                current_commit['body'] += '\n' + line
+def get_commits_between(from_ref: str, to_ref: str) -> list:
+    """Get commits between two references from the commit index"""
+    return get_commit_index().query(from_ref, to_ref) or []
 
-        if current_commit:
-            commits.append(current_commit)
 
-        return commits
+def get_commits_for_ranges(ranges: list, jobs: int = 1) -> list:
+    """
+    Get commits for each (from_ref, to_ref) pair, in the same order.
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting commits: {e}", file=sys.stderr)
-        return []
+    With jobs > 1 the ranges are listed by up to that many concurrent
+    `git rev-list` processes; commits not in the commit index yet are read
+    once, for all ranges together.
+    """
+    return [commits or [] for commits in get_commit_index().query_ranges(ranges, jobs=jobs)]
 
 
 def categorize_commit(commit: dict) -> str:
     """Categorize a commit based on conventional commits or keywords"""
-    subject = commit['subject'].lower()
-    body = commit['body'].lower()
-    full_text = subject + ' ' + body
-
-    # Conventional Commits prefixes
-    if subject.startswith('feat:') or subject.startswith('feature:'):
-        return 'added'
-    elif subject.startswith('fix:'):
-        return 'fixed'
-    elif subject.startswith('docs:'):
-        return 'docs'
-    elif subject.startswith('style:') or subject.startswith('refactor:'):
-        return 'changed'
-    elif subject.startswith('perf:'):
-        return 'changed'
-    elif subject.startswith('test:'):
-        return 'tests'
-    elif subject.startswith('chore:'):
-        return 'chore'
-    elif subject.startswith('breaking:') or 'breaking change' in body:
-        return 'breaking'
-    elif subject.startswith('remove:') or subject.startswith('delete:'):
-        return 'removed'
-    elif subject.startswith('deprecate:'):
-        return 'deprecated'
-    elif subject.startswith('security:'):
-        return 'security'
-
-    # Keyword-based categorization
-    feature_keywords = ['add', 'new', 'feature', 'implement', 'create']
-    fix_keywords = ['fix', 'bug', 'patch', 'resolve', 'correct']
-    improvement_keywords = ['update', 'improve', 'enhance', 'optimize', 'refactor']
-    removal_keywords = ['remove', 'delete', 'drop']
-    security_keywords = ['security', 'vulnerability', 'cve', 'exploit']
-
-    if any(kw in full_text for kw in security_keywords):
-        return 'security'
-    elif any(kw in subject for kw in feature_keywords):
-        return 'added'
-    elif any(kw in subject for kw in fix_keywords):
-        return 'fixed'
-    elif any(kw in subject for kw in removal_keywords):
-        return 'removed'
-    elif any(kw in subject for kw in improvement_keywords):
-        return 'changed'
-    else:
-        return 'changed'
+    return CATEGORIZER.categorize(commit)
 
 
 def format_commit_message(commit: dict) -> str:
@@ -189,133 +161,279 @@ def format_commit_message(commit: dict) -> str:
     return f"{subject} ([{short_hash}](https://github.com/brock-nelson/costudy-website/commit/{commit['hash']}))"
 
 
+def categorize_release(commits: list) -> dict:
+    """Sort a release's commits into {category: [commits]}"""
+    # Custom rule files may not define every category
+    categories = {category: [] for category in CHANGELOG_RULES['categories']}
+    categories.update(CATEGORIZER.categorize_batch(commits))
+    return categories
+
+
+def format_markdown_section(version: str, date: str, categories: dict) -> str:
+    """Format a categorized release as a Markdown changelog section"""
+    if not any(categories.values()):
+        return f"## [{version}] - {date}\n\nNo changes recorded.\n\n"
+
+    lines = [f"## [{version}] - {date}\n\n"]
+
+    # Keep a Changelog order
+    for category, heading in SECTION_HEADINGS:
+        if categories[category]:
+            lines.append(f"### {heading}\n\n")
+            for commit in categories[category]:
+                lines.append(f"- {format_commit_message(commit)}\n")
+            lines.append("\n")
+
+    return ''.join(lines)
+
+
+def format_json_release(version: str, date: str, sha: str, categories: dict) -> str:
+    """Format a categorized release as one JSON object"""
+    release = {
+        'version': version,
+        'date': date,
+        'sha': sha,
+        'categories': {
+            category: [
+                {
+                    'hash': commit['hash'],
+                    'date': commit['date'],
+                    'author': commit['author'],
+                    'subject': commit['subject'],
+                }
+                for commit in commits
+            ]
+            for category, commits in categories.items() if commits
+        },
+    }
+    return json.dumps(release, ensure_ascii=False)
+
+
+def format_release(fmt: str, version: str, date: str, sha: str, categories: dict) -> str:
+    """Format a categorized release in the given output format"""
+    if fmt == 'json':
+        return format_json_release(version, date, sha, categories)
+    return format_markdown_section(version, date, categories)
+
+
+def write_changelog(out, fmt: str, sections):
+    """Write a changelog document from an iterable of formatted sections"""
+    if fmt == 'json':
+        out.write('{\n  "releases": [')
+        for i, section in enumerate(sections):
+            out.write(',\n    ' if i else '\n    ')
+            out.write(section)
+        out.write('\n  ]\n}\n')
+    else:
+        out.write(CHANGELOG_HEADER)
+        for section in sections:
+            out.write(section)
+
+
 def generate_changelog_section(version: str, date: str, commits: list) -> str:
     """Generate a changelog section for a version"""
-    if not commits:
-        return f"## [{version}] - {date}\n\nNo changes recorded.\n\n"
+    return format_markdown_section(version, date, categorize_release(commits))
+
 
-    # Categorize commits
-    categories = {
-        'breaking': [],
-        'security': [],
-        'added': [],
-        'changed': [],
-        'deprecated': [],
-        'removed': [],
-        'fixed': [],
-        'docs': [],
-        'tests': [],
-        'chore': [],
+def commit_ids(categories: dict) -> dict:
+    """Reduce categorized commits to {category: [commit hashes]}"""
+    return {
+        category: [commit['hash'] for commit in commits]
+        for category, commits in categories.items() if commits
     }
 
-    for commit in commits:
-        category = categorize_commit(commit)
-        if category in categories:
-            categories[category].append(commit)
 
-    # Build changelog section
-    section = f"## [{version}] - {date}\n\n"
+def section_cache_key(from_sha: str, to_sha: str) -> str:
+    """Get the cache key for the release section between two tag commits"""
+    return f"{from_sha or 'root'}..{to_sha}@v{SECTION_FORMAT_VERSION}-{CATEGORIZER.version}"
 
-    # Keep a Changelog order
-    if categories['breaking']:
-        section += "### ⚠️ Breaking Changes\n\n"
-        for commit in categories['breaking']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    if categories['security']:
-        section += "### 🔒 Security\n\n"
-        for commit in categories['security']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    if categories['added']:
-        section += "### ✨ Added\n\n"
-        for commit in categories['added']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    if categories['changed']:
-        section += "### 🔄 Changed\n\n"
-        for commit in categories['changed']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    if categories['deprecated']:
-        section += "### ⚠️ Deprecated\n\n"
-        for commit in categories['deprecated']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    if categories['removed']:
-        section += "### 🗑️ Removed\n\n"
-        for commit in categories['removed']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    if categories['fixed']:
-        section += "### 🐛 Fixed\n\n"
-        for commit in categories['fixed']:
-            section += f"- {format_commit_message(commit)}\n"
-        section += "\n"
-
-    return section
-
-
-def generate_full_changelog() -> str:
-    """Generate complete changelog from all tags"""
-    tags = get_git_tags()
 
-    if not tags:
-        return "# Changelog\n\nAll notable changes to this project will be documented in this file.\n\nThe format is based on [Keep a Changelog](https://keepachangelog.com/en/1.0.0/),\nand this project adheres to [Semantic Versioning](https://semver.org/spec/v2.0.0.html).\n\n## [Unreleased]\n\nNo unreleased changes.\n\n"
+def read_cached_section(cache_dir: Path, name: str) -> str:
+    """Read a rendered release section from a previous run (None if missing)"""
+    try:
+        with open(cache_dir / name, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
 
-    changelog = """# Changelog
 
-All notable changes to this project will be documented in this file.
+def write_cached_section(cache_dir: Path, name: str, section: str):
+    """Store a rendered release section for the next run"""
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(cache_dir / name, 'w', encoding='utf-8') as f:
+            f.write(section)
+    except OSError as e:
+        print(f"Warning: Could not save changelog cache: {e}", file=sys.stderr)
+
+
+def prune_section_cache(cache_dir: Path, keys: list):
+    """Remove cached sections for tags that no longer exist"""
+    keep = set(keys)
+    for path in cache_dir.iterdir():
+        if path.stem not in keep:
+            path.unlink(missing_ok=True)
+
+
+def iter_full_changelog(cache_dir: Path = None, fmt: str = 'markdown', index_path: Path = RELEASE_INDEX_PATH):
+    """
+    Yield the formatted sections of the complete changelog, newest first.
+
+    Sections are produced one at a time, so only one is held in memory.
+    Tagged history never changes, so when cache_dir is given the formatted
+    section of every tag range is reused from the previous run, together
+    with its entry in the release index, and only the Unreleased section and
+    new tags are built from git history (one pass, see
+    git_history.load_history). The release index is rewritten once the last
+    section has been produced.
+    """
+    tags = get_tag_refs()
 
-The format is based on [Keep a Changelog](https://keepachangelog.com/en/1.0.0/),
-and this project adheres to [Semantic Versioning](https://semver.org/spec/v2.0.0.html).
+    if not tags:
+        if fmt != 'json':
+            yield "## [Unreleased]\n\nNo unreleased changes.\n\n"
+        return
 
-"""
+    keys = []
+    for i, tag in enumerate(tags):
+        from_sha = tags[i + 1]['sha'] if i + 1 < len(tags) else None
+        keys.append(section_cache_key(from_sha, tag['sha']))
+
+    ext = 'json' if fmt == 'json' else 'md'
+    cached = set()
+    if cache_dir and cache_dir.exists():
+        cached = {path.stem for path in cache_dir.glob(f'*.{ext}')}
+
+    old_entries = {}
+    if index_path:
+        old_index = load_release_index(index_path)
+        old_entries = {entry.get('key'): entry for entry in old_index['releases'].values()}
+        # Cached sections are only reused together with their index entry
+        cached &= set(old_entries)
+
+    # Commits behind the newest tag whose section and all older sections are
+    # cached never need to be read
+    exclude = []
+    for tag, key in reversed(list(zip(tags, keys))):
+        if key not in cached:
+            break
+        exclude = [tag['sha']]
+
+    history = load_history(tags=tags, exclude=exclude)
+    head_sha = history['head']
+    index = {'head': head_sha, 'releases': {}, 'unreleased': {}}
 
     # Add unreleased section
-    latest_tag = tags[0]
-    unreleased_commits = get_commits_between(latest_tag, 'HEAD')
+    unreleased_commits = history['unreleased']
     if unreleased_commits:
         unreleased_date = datetime.now().strftime('%Y-%m-%d')
-        changelog += generate_changelog_section('Unreleased', unreleased_date, unreleased_commits)
+        categories = categorize_release(unreleased_commits)
+        index['unreleased'] = commit_ids(categories)
+        yield format_release(fmt, 'Unreleased', unreleased_date, head_sha, categories)
 
     # Add sections for each tag
-    for i, tag in enumerate(tags):
-        date = get_tag_date(tag)
-        from_ref = tags[i + 1] if i + 1 < len(tags) else None
-
-        if from_ref:
-            commits = get_commits_between(from_ref, tag)
+    for i, (tag, key) in enumerate(zip(tags, keys)):
+        section = read_cached_section(cache_dir, f"{key}.{ext}") if key in cached else None
+        if section is not None:
+            entry = old_entries.get(key, {'commits': {}})
+        else:
+            categories = categorize_release(history['ranges'].pop(tag['name']))
+            section = format_release(fmt, tag['name'], tag['date'], tag['sha'], categories)
+            entry = {'key': key, 'commits': commit_ids(categories)}
+            if cache_dir:
+                write_cached_section(cache_dir, f"{key}.{ext}", section)
+
+        index['releases'][tag['name']] = {
+            'date': tag['date'],
+            'sha': tag['sha'],
+            'previous': tags[i + 1]['name'] if i + 1 < len(tags) else None,
+            'key': key,
+            'commits': entry['commits'],
+        }
+        yield section
+
+    if cache_dir and cache_dir.exists():
+        prune_section_cache(cache_dir, keys)
+    if index_path:
+        save_release_index(index, index_path)
+
+
+def write_full_changelog(out, cache_dir: Path = None, fmt: str = 'markdown', index_path: Path = RELEASE_INDEX_PATH):
+    """Write the complete changelog from all tags to a text stream"""
+    write_changelog(out, fmt, iter_full_changelog(cache_dir, fmt, index_path))
+
+
+def write_versions_changelog(out, versions: list, jobs: int = 1, fmt: str = 'markdown'):
+    """
+    Write a changelog with one section per version to a text stream.
+
+    Each version is compared with the tag before it (the oldest tag with
+    all history before it, as with --all). The ranges are
+    extracted concurrently (see get_commits_for_ranges) and the sections are
+    written newest tag first.
+    """
+    tags = get_tag_refs()
+    names = [tag['name'] for tag in tags]
+    refs = {tag['name']: tag for tag in tags}
+
+    # Versions that are not tags (e.g. HEAD) go first, then tag order
+    versions = sorted(versions, key=lambda v: names.index(v) if v in names else -1)
+
+    ranges = []
+    for version in versions:
+        idx = names.index(version) if version in names else -1
+        if 0 <= idx < len(names) - 1:
+            from_ref = names[idx + 1]
+        elif idx == -1 and names:
+            from_ref = names[0]
         else:
-            # First tag - get all commits up to it
-            try:
-                result = subprocess.run(
-                    ['git', 'rev-list', '--max-parents=0', 'HEAD'],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                first_commit = result.stdout.strip()
-                commits = get_commits_between(first_commit, tag)
-            except subprocess.CalledProcessError:
-                commits = []
+            from_ref = None
+        ranges.append((from_ref, version))
 
-        changelog += generate_changelog_section(tag, date, commits)
+    def sections():
+        for version, commits in zip(versions, get_commits_for_ranges(ranges, jobs)):
+            tag = refs.get(version, {})
+            date = tag.get('date') or datetime.now().strftime('%Y-%m-%d')
+            yield format_release(fmt, version, date, tag.get('sha'), categorize_release(commits))
 
-    return changelog
+    write_changelog(out, fmt, sections())
+
+
+def generate_full_changelog(cache_dir: Path = None, index_path: Path = RELEASE_INDEX_PATH) -> str:
+    """Generate complete changelog from all tags"""
+    changelog = io.StringIO()
+    write_full_changelog(changelog, cache_dir, index_path=index_path)
+    return changelog.getvalue()
+
+
+@contextmanager
+def open_changelog(output_path: Path):
+    """
+    Open a changelog file for writing.
+
+    Content goes to a temporary file next to output_path, which replaces the
+    real file only once writing finished, so readers never see a partial
+    changelog.
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f
+        if output_path.exists():
+            shutil.copymode(output_path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 def save_changelog(content: str, output_path: Path):
     """Save changelog to file"""
     try:
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
+        with open_changelog(output_path) as f:
             f.write(content)
         print(f"✓ Saved changelog to {output_path}")
     except Exception as e:
@@ -324,14 +442,22 @@ def save_changelog(content: str, output_path: Path):
 
 
 @click.command()
-@click.option('--version', '-v', help='Version to generate changelog for')
+@click.option('--version', '-v', 'versions', multiple=True, help='Version to generate changelog for (repeat for several versions)')
 @click.option('--from', 'from_ref', help='Starting reference (tag, branch, or commit)')
 @click.option('--to', 'to_ref', default='HEAD', help='Ending reference (default: HEAD)')
 @click.option('--all', 'generate_all', is_flag=True, help='Generate full changelog from all tags')
 @click.option('--output', '-o', type=click.Path(), help='Output file path (default: CHANGELOG.md in repo root)')
+@click.option('--no-cache', is_flag=True, help='Rebuild every release section and the commit index instead of reusing cached ones')
+@click.option('--categories', type=click.Path(exists=True), help='JSON file with commit category rules')
+@click.option('--jobs', '-j', default=1, type=int, help='Number of version ranges to list with git concurrently (default: 1)')
+@click.option('--format', 'fmt', type=click.Choice(['markdown', 'json']), default='markdown', help='Output format (default: markdown)')
 @click.option('--debug', is_flag=True, help='Enable debug output')
-def main(version: str, from_ref: str, to_ref: str, generate_all: bool, output: str, debug: bool):
+def main(versions: tuple, from_ref: str, to_ref: str, generate_all: bool, output: str, no_cache: bool, categories: str, jobs: int, fmt: str, debug: bool):
     """Generate structured changelog from git history"""
+    global CATEGORIZER, COMMIT_INDEX
+    if categories:
+        CATEGORIZER = load_categorizer(categories)
+    COMMIT_INDEX = CommitIndex(None if no_cache else COMMIT_INDEX_PATH)
 
     print(f"📋 CoStudy Changelog Generator")
     print(f"{'='*50}")
@@ -340,18 +466,45 @@ def main(version: str, from_ref: str, to_ref: str, generate_all: bool, output: s
     # Determine output path
     if output:
         output_path = Path(output)
+    elif fmt == 'json':
+        output_path = OUTPUT_DIR / "changelog.json"
     else:
         output_path = REPO_ROOT / "CHANGELOG.md"
 
     # Generate full changelog if --all
     if generate_all:
         print("Generating complete changelog from all tags...")
-        changelog = generate_full_changelog()
-        save_changelog(changelog, output_path)
+        try:
+            with open_changelog(output_path) as f:
+                write_full_changelog(f, None if no_cache else CACHE_DIR, fmt)
+            print(f"✓ Saved changelog to {output_path}")
+            print(f"✓ Updated release index at {RELEASE_INDEX_PATH}")
+        except Exception as e:
+            print(f"Error saving changelog: {e}", file=sys.stderr)
+            sys.exit(1)
+        print()
+        print("✅ Done!")
+        return
+
+    # Generate one section per version if several --version values are given
+    if len(versions) > 1:
+        if from_ref:
+            print("Error: --from cannot be combined with several --version values", file=sys.stderr)
+            sys.exit(1)
+        print(f"Generating changelog for {len(versions)} versions ({jobs} concurrent)...")
+        try:
+            with open_changelog(output_path) as f:
+                write_versions_changelog(f, list(versions), jobs, fmt)
+            print(f"✓ Saved changelog to {output_path}")
+        except Exception as e:
+            print(f"Error saving changelog: {e}", file=sys.stderr)
+            sys.exit(1)
         print()
         print("✅ Done!")
         return
 
+    version = versions[0] if versions else None
+
     # Determine version and references
     if version and not from_ref:
         # Get previous tag
@@ -360,18 +513,8 @@ def main(version: str, from_ref: str, to_ref: str, generate_all: bool, output: s
             from_ref = prev_tag
             print(f"Comparing {version} with previous tag: {from_ref}")
         else:
-            print(f"Warning: No previous tag found. Using first commit as baseline.", file=sys.stderr)
-            try:
-                result = subprocess.run(
-                    ['git', 'rev-list', '--max-parents=0', 'HEAD'],
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                from_ref = result.stdout.strip()
-            except subprocess.CalledProcessError:
-                print("Error: Could not find first commit", file=sys.stderr)
-                sys.exit(1)
+            # Like --all, the first release includes the root commit
+            print(f"Warning: No previous tag found. Including all history up to {version}.", file=sys.stderr)
         to_ref = version
     elif not from_ref:
         print("Error: Either --all, --version, or --from must be specified", file=sys.stderr)
@@ -381,7 +524,7 @@ def main(version: str, from_ref: str, to_ref: str, generate_all: bool, output: s
         version = to_ref
 
     print(f"Version: {version}")
-    print(f"Range: {from_ref} → {to_ref}")
+    print(f"Range: {from_ref or '(root)'} → {to_ref}")
     print()
 
     # Get commits
@@ -397,18 +540,15 @@ def main(version: str, from_ref: str, to_ref: str, generate_all: bool, output: s
 
     # Generate changelog section
     date = get_tag_date(version) if version != 'HEAD' else datetime.now().strftime('%Y-%m-%d')
-    changelog_section = generate_changelog_section(version, date, commits)
-
-    # Create full changelog with header
-    changelog = f"""# Changelog
-
-All notable changes to this project will be documented in this file.
-
-The format is based on [Keep a Changelog](https://keepachangelog.com/en/1.0.0/),
-and this project adheres to [Semantic Versioning](https://semver.org/spec/v2.0.0.html).
+    if fmt == 'json':
+        changelog = io.StringIO()
+        write_changelog(changelog, fmt, [format_release(fmt, version, date, None, categorize_release(commits))])
+        changelog = changelog.getvalue()
+    else:
+        changelog_section = generate_changelog_section(version, date, commits)
 
-{changelog_section}
-"""
+        # Create full changelog with header
+        changelog = f"{CHANGELOG_HEADER}{changelog_section}\n"
 
     # Save
     save_changelog(changelog, output_path)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Commit Categorizer - Shared rule table for sorting commits into categories
+
+Used by changelog.py (Keep a Changelog sections) and marketing_pack.py
+(features / fixes / improvements). The rules of a table are tried in
+order and the first one that matches a commit decides its category, just
+like the chains of startswith / substring checks they replace.
+
+Rule tables can be loaded from a JSON file with the same shape as
+CHANGELOG_RULES below.
+"""
+
+import json
+import hashlib
+from pathlib import Path
+
+# Keep a Changelog categories used by changelog.py
+CHANGELOG_RULES = {
+    'default': 'changed',
+    'categories': [
+        'breaking', 'security', 'added', 'changed', 'deprecated',
+        'removed', 'fixed', 'docs', 'tests', 'chore',
+    ],
+    # Conventional Commits prefixes, highest priority first. A rule with
+    # "body" also matches when one of those phrases appears in the body.
+    'prefix_rules': [
+        {'category': 'added', 'prefixes': ['feat', 'feature']},
+        {'category': 'fixed', 'prefixes': ['fix']},
+        {'category': 'docs', 'prefixes': ['docs']},
+        {'category': 'changed', 'prefixes': ['style', 'refactor', 'perf']},
+        {'category': 'tests', 'prefixes': ['test']},
+        {'category': 'chore', 'prefixes': ['chore']},
+        {'category': 'breaking', 'prefixes': ['breaking'], 'body': ['breaking change']},
+        {'category': 'removed', 'prefixes': ['remove', 'delete']},
+        {'category': 'deprecated', 'prefixes': ['deprecate']},
+        {'category': 'security', 'prefixes': ['security']},
+    ],
+    # Keyword fallbacks, highest priority first. "full" rules also search
+    # the commit body; the rest only look at the subject.
+    'keyword_rules': [
+        {'category': 'security', 'keywords': ['security', 'vulnerability', 'cve', 'exploit'], 'scope': 'full'},
+        {'category': 'added', 'keywords': ['add', 'new', 'feature', 'implement', 'create']},
+        {'category': 'fixed', 'keywords': ['fix', 'bug', 'patch', 'resolve', 'correct']},
+        {'category': 'removed', 'keywords': ['remove', 'delete', 'drop']},
+        {'category': 'changed', 'keywords': ['update', 'improve', 'enhance', 'optimize', 'refactor']},
+    ],
+}
+
+# Release summary categories used by marketing_pack.py
+MARKETING_RULES = {
+    'default': 'other',
+    'categories': ['features', 'fixes', 'improvements', 'docs', 'other'],
+    'prefix_rules': [],
+    'keyword_rules': [
+        {'category': 'features', 'keywords': ['add', 'new', 'feature', 'implement']},
+        {'category': 'fixes', 'keywords': ['fix', 'bug', 'patch', 'resolve']},
+        {'category': 'improvements', 'keywords': ['update', 'improve', 'enhance', 'optimize', 'refactor']},
+        {'category': 'docs', 'keywords': ['doc', 'readme', 'comment']},
+    ],
+}
+
+
+class CommitCategorizer:
+    """Categorizes commits by trying the rules of a table in priority order."""
+
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self.default = rules['default']
+        self.categories = list(rules['categories'])
+        if self.default not in self.categories:
+            self.categories.append(self.default)
+
+        # Fingerprint of the rule table, for caches of categorized output
+        encoded = json.dumps(rules, sort_keys=True).encode('utf-8')
+        self.version = hashlib.sha1(encoded).hexdigest()[:12]
+
+        # (category, prefixes, body phrases) and (category, keywords,
+        # searches body) tuples, highest priority first
+        self._prefix_rules = [
+            (rule['category'], frozenset(rule.get('prefixes', [])), tuple(rule.get('body', [])))
+            for rule in rules.get('prefix_rules', [])
+        ]
+        self._keyword_rules = [
+            (rule['category'], tuple(rule['keywords']), rule.get('scope') == 'full')
+            for rule in rules.get('keyword_rules', [])
+        ]
+        self._uses_body = (
+            any(body for _, _, body in self._prefix_rules)
+            or any(full for _, _, full in self._keyword_rules)
+        )
+
+    @classmethod
+    def from_file(cls, path) -> 'CommitCategorizer':
+        """Load a rule table from a JSON file"""
+        with open(Path(path), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def categorize(self, commit: dict) -> str:
+        """Categorize a single commit"""
+        subject = commit['subject'].lower()
+        body = commit.get('body', '').lower() if self._uses_body else ''
+
+        # Conventional Commits prefixes
+        prefix, colon, _ = subject.partition(':')
+        for category, prefixes, phrases in self._prefix_rules:
+            if (colon and prefix in prefixes) or any(phrase in body for phrase in phrases):
+                return category
+
+        # Keyword-based categorization
+        full_text = subject + ' ' + body
+        for category, keywords, full in self._keyword_rules:
+            text = full_text if full else subject
+            if any(keyword in text for keyword in keywords):
+                return category
+
+        return self.default
+
+    def categorize_batch(self, commits) -> dict:
+        """Categorize many commits into {category: [commits]} in one pass"""
+        categories = {category: [] for category in self.categories}
+        categorize = self.categorize
+        for commit in commits:
+            categories.setdefault(categorize(commit), []).append(commit)
+        return categories
+
+
+def load_categorizer(path=None, rules: dict = None) -> CommitCategorizer:
+    """Load a categorizer from a JSON rule file, or from the given default rules"""
+    if path:
+        return CommitCategorizer.from_file(path)
+    return CommitCategorizer(rules or CHANGELOG_RULES)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Commit Index - Shared on-disk cache of git commits
+
+Used by changelog.py and marketing_pack.py to look up the commits of a
+range (hash, parents, commit time, date, author, subject, body and
+per-file line counts) without reading them from git again. Which commits
+a range holds is always left to `git rev-list`, which is fast even on a
+long history; only commits that are not in the index yet are read with
+`git log` and appended to it. The index lives in
+output/commit-index.jsonl: a header line followed by one commit per line.
+"""
+
+import os
+import sys
+import json
+import heapq
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from git_history import OUTPUT_DIR, iter_commits
+
+COMMIT_INDEX_PATH = OUTPUT_DIR / "commit-index.jsonl"
+
+# Bump whenever the record layout changes so that old indexes are rebuilt
+INDEX_FORMAT = 3
+
+
+class CommitIndex:
+    """Commits read from git so far, by sha; ranges are queried through `git rev-list`."""
+
+    def __init__(self, path: Path = COMMIT_INDEX_PATH):
+        self.path = path
+        self.by_hash = {}
+        # Set when the file on disk cannot simply be appended to
+        self._rewrite = True
+        if path:
+            self._load()
+
+    def _load(self):
+        """Read the index file, if there is a usable one"""
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except OSError:
+            return
+
+        records = []
+        with f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return
+            if header.get('format') != INDEX_FORMAT:
+                return
+            complete = True
+            for line in f:
+                # A missing newline means the last append was interrupted
+                try:
+                    if not line.endswith('\n'):
+                        raise ValueError(line)
+                    records.append(json.loads(line))
+                except ValueError:
+                    complete = False
+                    break
+
+        for commit in records:
+            self.by_hash.setdefault(commit['hash'], commit)
+        self._rewrite = not complete or len(self.by_hash) != len(records)
+
+    def _save(self, new_commits: list):
+        """Append new commits to the index file, or rewrite it if needed"""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._rewrite:
+                tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({'format': INDEX_FORMAT}) + '\n')
+                    for commit in self.by_hash.values():
+                        f.write(json.dumps(commit) + '\n')
+                os.replace(tmp_path, self.path)
+                self._rewrite = False
+            elif new_commits:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(commit) + '\n' for commit in new_commits)
+        except OSError as e:
+            print(f"Warning: Could not save commit index: {e}", file=sys.stderr)
+
+    def read(self, shas: list) -> int:
+        """Read the given commits from git (one `git log --stdin --no-walk`) and add them to the index"""
+        new_commits = [
+            commit for commit in iter_commits(['--no-walk=unsorted', '--stdin'], with_parents=True, with_stat=True, stdin=shas)
+            if commit['hash'] not in self.by_hash
+        ]
+        for commit in new_commits:
+            self.by_hash[commit['hash']] = commit
+        self._save(new_commits)
+        return len(new_commits)
+
+    def rev_list(self, from_ref: str, to_ref: str, include_merges: bool = False) -> list:
+        """Get the shas in from_ref..to_ref in `git log` order (None on error)"""
+        cmd = ['git', 'rev-list', to_ref]
+        if from_ref:
+            cmd.append(f'^{from_ref}')
+        if not include_merges:
+            cmd.append('--no-merges')
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Error listing commits {from_ref or ''}..{to_ref}: {e.stderr.strip()}", file=sys.stderr)
+            return None
+        return result.stdout.split()
+
+    def query(self, from_ref: str, to_ref: str, include_merges: bool = False) -> list:
+        """
+        Get the commits in from_ref..to_ref, newest first (None on error).
+
+        Commits that are not indexed yet are read from git first. With
+        from_ref None the range starts at the root commit.
+        """
+        return self.query_ranges([(from_ref, to_ref)], include_merges)[0]
+
+    def query_ranges(self, ranges: list, include_merges: bool = False, jobs: int = 1) -> list:
+        """
+        Get the commits of each (from_ref, to_ref) pair, like query().
+
+        With jobs > 1 up to that many `git rev-list` processes run at once
+        (the threads only wait on them). Commits missing from the index are
+        then read with a single `git log` for all ranges together.
+        """
+        if jobs > 1 and len(ranges) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                range_shas = list(pool.map(lambda refs: self.rev_list(*refs, include_merges), ranges))
+        else:
+            range_shas = [self.rev_list(from_ref, to_ref, include_merges) for from_ref, to_ref in ranges]
+
+        missing = dict.fromkeys(sha for shas in range_shas if shas for sha in shas if sha not in self.by_hash)
+        if missing:
+            self.read(list(missing))
+        return [
+            [self.by_hash[sha] for sha in shas if sha in self.by_hash] if shas is not None else None
+            for shas in range_shas
+        ]
+
+
+def largest_changes(commits: list, limit: int = 5) -> dict:
+    """
+    Rank the commits and files of a range by lines changed.
+
+    Returns {'commits': [(commit, insertions, deletions)], 'files': [(path,
+    insertions, deletions)]}, biggest first, with at most limit entries each.
+    """
+    file_totals = {}
+    for commit in commits:
+        numstat = commit.get('numstat', ())
+        for i, path in enumerate(commit.get('files', ())):
+            totals = file_totals.setdefault(path, [0, 0])
+            totals[0] += numstat[2 * i]
+            totals[1] += numstat[2 * i + 1]
+
+    top_commits = heapq.nlargest(limit, commits, key=lambda commit: commit['stat'][1] + commit['stat'][2])
+    top_files = heapq.nlargest(limit, file_totals.items(), key=lambda item: item[1][0] + item[1][1])
+    return {
+        'commits': [(commit, commit['stat'][1], commit['stat'][2]) for commit in top_commits if any(commit['stat'][1:])],
+        'files': [(path, insertions, deletions) for path, (insertions, deletions) in top_files if insertions or deletions],
+    }
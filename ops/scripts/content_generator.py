@@ -31,10 +31,13 @@ Usage:
 import os
 import sys
 import json
+import time
 import argparse
 from datetime import datetime
 from typing import Dict, List, Optional
 from openai import OpenAI
+from cost_ledger import CostTracker
+from response_cache import create_cached, disable_cache_reads
 
 # Configuration - PREMIUM QUALITY SETTINGS
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -43,6 +46,15 @@ OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "8000"))  # 2x longer for
 ENABLE_REFINEMENT = os.getenv("ENABLE_REFINEMENT", "true").lower() == "true"
 QUALITY_MODE = os.getenv("QUALITY_MODE", "premium").lower()  # premium, standard, budget
 
+# Content type recorded for each command's output (see track_costs.py)
+CONTENT_TYPES = {
+    "blog": "blog",
+    "social": "social",
+    "image": "image",
+    "research": "research",
+    "epic": "spec",
+}
+
 # Cost tracking - PREMIUM MODELS
 COST_PER_1K_INPUT = 0.01     # GPT-4 Turbo input
 COST_PER_1K_OUTPUT = 0.03    # GPT-4 Turbo output
@@ -54,15 +66,17 @@ IMAGE_QUALITY = "hd" if QUALITY_MODE == "premium" else "standard"
 CREATIVITY_TEMP = 0.9 if QUALITY_MODE == "premium" else 0.7
 PRECISION_TEMP = 0.3 if QUALITY_MODE == "premium" else 0.5
 
-class ContentGenerator:
+class ContentGenerator(CostTracker):
     """Main content generation orchestrator."""
 
+    COST_SOURCE = "content_generator"
+
     def __init__(self, api_key: str = None):
+        super().__init__()
         self.api_key = api_key or OPENAI_API_KEY
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY is required")
         self.client = OpenAI(api_key=self.api_key)
-        self.total_cost = 0.0
 
     def generate_blog_post(
         self,
@@ -131,7 +145,9 @@ Make it engaging, data-driven, and optimized for search engines!"""
 
         # FIRST PASS: Generate comprehensive draft
         print("   📝 Pass 1: Generating comprehensive draft...")
-        response = self.client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.client.chat.completions,
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": "You are a WORLD-CLASS content marketer and SEO specialist for educational technology. Your content wins awards and drives massive engagement."},
@@ -141,11 +157,12 @@ Make it engaging, data-driven, and optimized for search engines!"""
             temperature=CREATIVITY_TEMP,  # Higher for creativity
             response_format={"type": "json_object"}
         )
+        response = raw.parse()
 
         draft_content = response.choices[0].message.content
         usage = response.usage
-        cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
-        self.total_cost += cost
+        cost = 0.0 if raw.cached else self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
+        self._add_cost(cost, "blog", OPENAI_MODEL, usage.prompt_tokens, usage.completion_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
         print(f"   ✅ Draft generated ({usage.completion_tokens} tokens, ${cost:.4f})")
 
@@ -169,7 +186,9 @@ Make it:
 
 Return the improved version in the same JSON format, but BETTER."""
 
-            refinement = self.client.chat.completions.create(
+            started = time.monotonic()
+            raw = create_cached(
+                self.client.chat.completions,
                 model=OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": "You are a senior editor who transforms good content into EXCEPTIONAL content."},
@@ -179,11 +198,12 @@ Return the improved version in the same JSON format, but BETTER."""
                 temperature=PRECISION_TEMP,  # Lower for refinement
                 response_format={"type": "json_object"}
             )
+            refinement = raw.parse()
 
             content = refinement.choices[0].message.content
             refine_usage = refinement.usage
-            refine_cost = self._calculate_cost(refine_usage.prompt_tokens, refine_usage.completion_tokens)
-            self.total_cost += refine_cost
+            refine_cost = 0.0 if raw.cached else self._calculate_cost(refine_usage.prompt_tokens, refine_usage.completion_tokens)
+            self._add_cost(refine_cost, "blog", OPENAI_MODEL, refine_usage.prompt_tokens, refine_usage.completion_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
             print(f"   ✅ Refinement complete (+${refine_cost:.4f})")
 
@@ -252,7 +272,9 @@ Format as JSON:
     }}
 }}"""
 
-        response = self.client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.client.chat.completions,
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": "You are a social media expert specializing in educational technology marketing."},
@@ -262,11 +284,12 @@ Format as JSON:
             temperature=0.8,
             response_format={"type": "json_object"}
         )
+        response = raw.parse()
 
         content = response.choices[0].message.content
         usage = response.usage
-        cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
-        self.total_cost += cost
+        cost = 0.0 if raw.cached else self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
+        self._add_cost(cost, "social", OPENAI_MODEL, usage.prompt_tokens, usage.completion_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
         print(f"   ✅ Generated social content (${cost:.4f})")
 
@@ -305,7 +328,8 @@ PREMIUM QUALITY REQUIREMENTS:
 
 Create a stunning, magazine-worthy image that represents Fortune-100 level quality."""
 
-        response = self.client.images.generate(
+        started = time.monotonic()
+        raw = self.client.images.with_raw_response.generate(
             model="dall-e-3",
             prompt=enhanced_prompt,
             size=size,
@@ -313,12 +337,13 @@ Create a stunning, magazine-worthy image that represents Fortune-100 level quali
             style=style,
             n=1
         )
+        response = raw.parse()
 
         image_url = response.data[0].url
         revised_prompt = response.data[0].revised_prompt
 
         cost = COST_PER_IMAGE_HD if quality == "hd" else COST_PER_IMAGE_STD
-        self.total_cost += cost
+        self._add_cost(cost, "image", "dall-e-3", latency=time.monotonic() - started, retries=raw.retries_taken)
 
         print(f"   ✅ Generated {quality.upper()} image (${cost:.4f})")
         print(f"   📸 DALL-E enhanced prompt: {revised_prompt[:100]}...")
@@ -366,7 +391,9 @@ Provide:
 
 Format as structured JSON with clear sections."""
 
-        response = self.client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.client.chat.completions,
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": "You are a senior market research analyst specializing in educational technology."},
@@ -376,11 +403,12 @@ Format as structured JSON with clear sections."""
             temperature=0.3,  # Lower for more factual
             response_format={"type": "json_object"}
         )
+        response = raw.parse()
 
         content = response.choices[0].message.content
         usage = response.usage
-        cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
-        self.total_cost += cost
+        cost = 0.0 if raw.cached else self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
+        self._add_cost(cost, "research", OPENAI_MODEL, usage.prompt_tokens, usage.completion_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
         print(f"   ✅ Completed research (${cost:.4f})")
 
@@ -428,7 +456,9 @@ Generate a complete epic with:
 
 Format as JSON with all fields."""
 
-        response = self.client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.client.chat.completions,
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": "You are a senior product manager with expertise in agile development."},
@@ -438,11 +468,12 @@ Format as JSON with all fields."""
             temperature=0.5,
             response_format={"type": "json_object"}
         )
+        response = raw.parse()
 
         content = response.choices[0].message.content
         usage = response.usage
-        cost = self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
-        self.total_cost += cost
+        cost = 0.0 if raw.cached else self._calculate_cost(usage.prompt_tokens, usage.completion_tokens)
+        self._add_cost(cost, "spec", OPENAI_MODEL, usage.prompt_tokens, usage.completion_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
         print(f"   ✅ Generated epic (${cost:.4f})")
 
@@ -472,6 +503,7 @@ Format as JSON with all fields."""
 
 def main():
     parser = argparse.ArgumentParser(description="Automated Content Generation")
+    parser.add_argument("--no-cache", action="store_true", help="Call the APIs even if the same request was answered before")
     subparsers = parser.add_subparsers(dest="command", help="Content type to generate")
 
     # Blog post
@@ -511,6 +543,9 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if args.no_cache:
+        disable_cache_reads()
+
     # Initialize generator
     generator = ContentGenerator()
 
@@ -543,9 +578,19 @@ def main():
                 business_goal=args.goal
             )
 
-        # Save output
+        # Save output; the metadata goes first, ending with cost and ai,
+        # so track_costs.py can stop reading there
+        header = {
+            "content_type": CONTENT_TYPES[args.command],
+            "tokens_in": generator.total_tokens_in,
+            "tokens_out": generator.total_tokens_out,
+            "latency": round(generator.total_latency, 3),
+            "cost": generator.get_total_cost(),
+            "ai": "dall-e-3" if args.command == "image" else OPENAI_MODEL,
+        }
+        content = {key: value for key, value in result.items() if key not in header}
         with open(args.output, "w") as f:
-            json.dump(result, f, indent=2)
+            json.dump({**header, **content}, f, indent=2)
 
         print(f"\n✅ Content saved to: {args.output}")
         print(f"💰 Total cost: ${generator.get_total_cost():.4f}")
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Cost Ledger - Append-only record of AI API spend
+
+Used by content_generator.py and ultimate_content_generator.py (via
+CostTracker) and by reviewer.py and spec_writer.py (via record_usage) to
+log one compact record per API call, and by track_costs.py to report on spend
+without opening every generated artifact. The ledger lives in
+output/cost-ledger.jsonl (COST_LEDGER overrides the path, an empty value
+turns logging off): one JSON object per line, in the order the calls
+finished, e.g.
+
+    {"time": 1717171717.123, "type": "blog", "ai": "gpt-4-turbo", "cost": 0.0842, "tokens_in": 1200, "tokens_out": 2400, "latency": 21.384, "retries": 0, "source": "content_generator", "run": "5f0c2a9e1b7d"}
+
+"latency" is the wall time of the call in seconds, retries included (null
+when unknown), and "retries" how often the API client retried it.
+
+"run" is the same for every call made by one process, so the calls that
+produced one piece of content (e.g. a draft and its refinement) can be
+grouped.
+
+Daily totals per content type and AI are kept next to the ledger in
+cost-ledger.rollup.json (see CostRollups), so reports over long ranges
+don't read every record.
+
+budget_allows() is the budget gate: generators ask it before expensive
+calls whether this month's spend plus the call's estimated cost stays
+within MONTHLY_BUDGET.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent
+OUTPUT_DIR = SCRIPT_DIR.parent / "output"
+_ledger = os.getenv("COST_LEDGER", str(OUTPUT_DIR / "cost-ledger.jsonl"))
+COST_LEDGER_PATH = Path(_ledger) if _ledger else None
+
+# Monthly spend limit in USD ("unlimited" or unset: no limit)
+_budget = os.getenv("MONTHLY_BUDGET", "").strip().lower()
+try:
+    MONTHLY_BUDGET = float(_budget) if _budget not in ("", "unlimited") else None
+except ValueError:
+    print(f"Warning: Ignoring MONTHLY_BUDGET={_budget!r} (not a number)", file=sys.stderr)
+    MONTHLY_BUDGET = None
+
+# Written with every record made by this process
+RUN_ID = uuid.uuid4().hex[:12]
+
+# OpenAI prices in USD per 1K tokens: model -> (input, output). Models
+# that are not listed are priced like DEFAULT_PRICE_MODEL
+OPENAI_PRICES = {
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4-turbo': (0.01, 0.03),
+}
+DEFAULT_PRICE_MODEL = 'gpt-4o'
+
+# Ledger records of one run and content type are merged into one content
+# piece until the run has written nothing for this long
+RUN_IDLE_SECONDS = 3600
+
+# Bump whenever the rollup file layout changes so that it is rebuilt
+ROLLUP_FORMAT = 2
+
+# Latency histogram buckets per doubling: a bucket's midpoint is within 5%
+# of every latency in it
+LATENCY_BUCKETS_PER_DOUBLING = 8
+
+
+def record_cost(content_type: str, ai: str, cost: float, tokens_in: int = 0, tokens_out: int = 0, source: str = None, latency: float = None, retries: int = 0, path: Path = COST_LEDGER_PATH) -> dict:
+    """Append the cost of one API call to the ledger"""
+    record = {
+        'time': round(time.time(), 3),
+        'type': content_type,
+        'ai': ai,
+        'cost': round(float(cost), 6),
+        'tokens_in': tokens_in,
+        'tokens_out': tokens_out,
+        'latency': round(latency, 3) if latency is not None else None,
+        'retries': retries,
+        'source': source,
+        'run': RUN_ID,
+    }
+    if not path:
+        return record
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One write per record: appends from concurrent runs don't interleave
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+    except OSError as e:
+        print(f"Warning: Could not write cost ledger: {e}", file=sys.stderr)
+    return record
+
+
+def openai_cost(model: str, tokens_in: int, tokens_out: int) -> float:
+    """Get the cost of an OpenAI call from its token counts (see OPENAI_PRICES)"""
+    input_price, output_price = OPENAI_PRICES.get(model, OPENAI_PRICES[DEFAULT_PRICE_MODEL])
+    return (tokens_in / 1000) * input_price + (tokens_out / 1000) * output_price
+
+
+def record_usage(content_type: str, model: str, usage, source: str, latency: float = None, retries: int = 0) -> dict:
+    """Append the cost of one OpenAI call to the ledger, from the response's usage"""
+    cost = openai_cost(model, usage.prompt_tokens, usage.completion_tokens)
+    return record_cost(content_type, model, cost, usage.prompt_tokens, usage.completion_tokens, source=source, latency=latency, retries=retries)
+
+
+class CostTracker:
+    """
+    Base of the content generators: running totals of the cost, tokens and
+    latency of a run's API calls, each also logged to the ledger under
+    COST_SOURCE.
+    """
+
+    COST_SOURCE = None
+
+    def __init__(self):
+        self.total_cost = 0.0
+        self.total_tokens_in = 0
+        self.total_tokens_out = 0
+        self.total_latency = 0.0
+
+    def _add_cost(self, cost: float, content_type: str, ai: str, tokens_in: int = 0, tokens_out: int = 0, latency: float = None, retries: int = 0, cached: bool = False):
+        """Add the cost, tokens, latency (seconds) and retries of one API call to the totals and the cost ledger (cached responses are not logged)."""
+        self.total_cost += cost
+        self.total_tokens_in += tokens_in
+        self.total_tokens_out += tokens_out
+        self.total_latency += latency or 0
+        if cached:
+            return
+        record_cost(content_type, ai, cost, tokens_in, tokens_out, source=self.COST_SOURCE, latency=latency, retries=retries)
+
+
+def iter_ledger(path: Path = COST_LEDGER_PATH, start: float = None, end: float = None, offset: int = 0, end_offset: int = None):
+    """
+    Yield the ledger records with start <= time <= end (Unix timestamps),
+    oldest first.
+
+    Reading starts at byte offset and stops before end_offset, which must
+    both be at the start of a record (see CostRollups.days).
+    """
+    try:
+        f = open(path, 'rb')
+    except (OSError, TypeError):
+        return
+    with f:
+        if offset:
+            f.seek(offset)
+        for line in f:
+            # A missing newline means the last append was interrupted
+            if not line.endswith(b'\n'):
+                break
+            if end_offset is not None:
+                if offset >= end_offset:
+                    break
+                offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            timestamp = record.get('time', 0)
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                continue
+            yield record
+
+
+def iter_appended(path: Path, offset: int = 0):
+    """
+    Yield (end offset, record) for every complete line of the ledger after
+    byte offset; record is None for a line that is not valid JSON.
+    """
+    try:
+        f = open(path, 'rb')
+    except (OSError, TypeError):
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            # Leave an interrupted append for the next read
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield offset, record
+
+
+def latency_bucket(latency: float) -> int:
+    """Get the histogram bucket of a latency in seconds"""
+    return math.floor(math.log2(max(latency, 0.001)) * LATENCY_BUCKETS_PER_DOUBLING)
+
+
+def bucket_latency(bucket: int) -> float:
+    """Get the latency in seconds in the middle of a histogram bucket"""
+    return 2 ** ((bucket + 0.5) / LATENCY_BUCKETS_PER_DOUBLING)
+
+
+def rollup_path(ledger_path: Path) -> Path:
+    """Get the path of the rollups of a ledger (cost-ledger.jsonl -> cost-ledger.rollup.json)"""
+    return ledger_path.with_name(f"{ledger_path.stem}.rollup.json")
+
+
+class CostRollups:
+    """
+    Daily spend per content type and AI of a cost ledger.
+
+    Records are merged into content pieces the way track_costs.py does it
+    (one piece per run and content type, see RUN_IDLE_SECONDS). A piece is
+    counted on the day of its first record and its cost on the days it was
+    spent, under the AI of its first record. Calls are also counted per
+    day and AI with their retries, latency histogram (see latency_bucket)
+    and completion tokens, for the performance figures. update() only reads
+    the records appended since the last update, so the rollups stay in
+    step with the ledger without the generators having to write them.
+    """
+
+    def __init__(self, ledger_path: Path, path: Path = None):
+        self.ledger_path = Path(ledger_path)
+        self.path = path or rollup_path(self.ledger_path)
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        # Ledger bytes rolled up so far
+        self.size = 0
+        # 'YYYY-MM-DD' -> {'offset': ledger byte offset of the day's first
+        # record, 'groups': {type: {ai: [pieces, cost]}}, 'calls': {ai:
+        # {'calls', 'retries', 'timed', 'latency', 'tokens_out', 'histogram'}}}
+        # where latency and tokens_out add up the calls with a latency
+        self.days = {}
+        # "run<TAB>type" -> [time of last record, ai] for the pieces
+        # whose run may still write records, least recent first
+        self.open = {}
+        self.dirty = False
+
+    def _load(self):
+        """Read the rollup file, if there is a usable one"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') == ROLLUP_FORMAT:
+            self.size = data.get('ledger_size', 0)
+            self.days = data.get('days', {})
+            self.open = data.get('open', {})
+
+    def save(self):
+        """Write the rollup file if anything changed"""
+        if not self.dirty:
+            return
+        try:
+            # Generators checking the budget may save at the same time
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'format': ROLLUP_FORMAT,
+                    'ledger_size': self.size,
+                    'days': self.days,
+                    'open': self.open,
+                }, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save cost rollups: {e}", file=sys.stderr)
+
+    def update(self) -> 'CostRollups':
+        """Roll up the records appended to the ledger since the last update and save"""
+        try:
+            size = os.path.getsize(self.ledger_path)
+        except OSError:
+            size = 0
+        if size < self.size:
+            # The ledger was replaced or truncated: roll it up again
+            self._reset()
+            self.dirty = True
+
+        if size > self.size:
+            try:
+                for end, record in iter_appended(self.ledger_path, self.size):
+                    if record is not None:
+                        self._add(record, self.size)
+                    self.size = end
+                    self.dirty = True
+            except OSError as e:
+                print(f"Warning: Could not read cost ledger: {e}", file=sys.stderr)
+
+        self.save()
+        return self
+
+    def _add(self, record: dict, offset: int):
+        """Add one ledger record found at byte offset"""
+        timestamp = record.get('time', 0)
+        content_type = record.get('type') or 'unknown'
+        day = date.fromtimestamp(timestamp).isoformat()
+        if day not in self.days:
+            self.days[day] = {'offset': offset, 'groups': {}}
+
+        # Close the pieces of runs that went idle
+        while self.open:
+            key, piece = next(iter(self.open.items()))
+            if timestamp - piece[0] <= RUN_IDLE_SECONDS:
+                break
+            del self.open[key]
+
+        run = record.get('run')
+        key = f"{run}\t{content_type}"
+        piece = self.open.pop(key, None) if run else None
+        if piece:
+            piece[0] = timestamp
+            new_pieces = 0
+        else:
+            piece = [timestamp, record.get('ai') or 'unknown']
+            new_pieces = 1
+        if run:
+            self.open[key] = piece
+
+        stats = self.days[day]['groups'].setdefault(content_type, {}).setdefault(piece[1], [0, 0.0])
+        stats[0] += new_pieces
+        stats[1] += float(record.get('cost') or 0)
+
+        calls = self.days[day].setdefault('calls', {}).setdefault(record.get('ai') or 'unknown', {
+            'calls': 0, 'retries': 0, 'timed': 0, 'latency': 0.0, 'tokens_out': 0, 'histogram': {},
+        })
+        calls['calls'] += 1
+        calls['retries'] += record.get('retries') or 0
+        latency = record.get('latency')
+        if latency is not None:
+            calls['timed'] += 1
+            calls['latency'] += latency
+            calls['tokens_out'] += record.get('tokens_out') or 0
+            bucket = str(latency_bucket(latency))
+            calls['histogram'][bucket] = calls['histogram'].get(bucket, 0) + 1
+
+    def iter_days(self, first: date, last: date):
+        """Yield (day, {'offset': ..., 'groups': ...}) for the days from first to last with records, oldest first"""
+        first, last = first.isoformat(), last.isoformat()
+        for day in sorted(self.days):
+            if first <= day <= last:
+                yield date.fromisoformat(day), self.days[day]
+
+    def spend(self, first: date, last: date) -> float:
+        """Get the total cost of the days from first to last"""
+        return sum(
+            cost
+            for _, entry in self.iter_days(first, last)
+            for by_ai in entry['groups'].values()
+            for _, cost in by_ai.values()
+        )
+
+    def offset(self, first: date) -> int:
+        """Get the byte offset from which the ledger holds every record since the day first"""
+        first = first.isoformat()
+        return min((entry['offset'] for day, entry in self.days.items() if day >= first), default=self.size)
+
+
+def budget_allows(estimated_cost: float, budget: float = MONTHLY_BUDGET, path: Path = COST_LEDGER_PATH) -> bool:
+    """Check whether this month's ledger spend plus estimated_cost stays within budget (always true without a budget)"""
+    if budget is None or not path:
+        return True
+    today = date.today()
+    spent = CostRollups(path).update().spend(today.replace(day=1), today)
+    return spent + estimated_cost <= budget
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Diff Packer - Fits the diff of a pull request into a token budget
+
+Used by reviewer.py to build the review prompt. Patches are split into
+hunks and each hunk gets a risk score from the rule tables below (API
+routes, auth and the database schema first, docs last; added lines and
+keywords such as "password" or "eval(" raise it). Hunks are then taken
+in order of risk until the budget is spent. Generated and vendored
+files (lockfiles, build output, Drizzle snapshots) are only listed with
+their line counts. For pull requests too big for one review,
+plan_shards splits the files into groups reviewed separately.
+
+Tokens are estimated at CHARS_PER_TOKEN characters per token, close
+enough for code to budget with and free of a tokenizer dependency.
+"""
+
+import re
+from typing import Dict, List
+
+# Rough characters per token for code and diffs
+CHARS_PER_TOKEN = 4
+
+# Files whose diff is never sent: lockfiles, build output, vendored code
+# and generated snapshots
+GENERATED_PATTERNS = [
+    r'(^|/)(package-lock\.json|yarn\.lock|pnpm-lock\.yaml|bun\.lockb|poetry\.lock|Pipfile\.lock|Cargo\.lock|composer\.lock|Gemfile\.lock)$',
+    r'(^|/)(node_modules|vendor|dist|build|out|\.next|coverage)/',
+    r'\.min\.(js|css)$',
+    r'\.map$',
+    r'(^|/)__snapshots__/|\.snap$',
+    r'^drizzle/meta/',
+    r'(^|/)next-env\.d\.ts$',
+]
+
+# (pattern, weight, reason), highest risk first; a file gets the weight
+# of the first pattern its path matches
+FILE_RISK_RULES = [
+    (r'^src/app/api/', 5, 'API route'),
+    (r'(^|/)(auth|middleware)(\.\w+)?$|(^|/)\(auth\)/|(^|/)auth/', 5, 'authentication'),
+    (r'^drizzle/.*\.sql$|^src/db/|(^|/)schema\.\w+$', 5, 'database schema'),
+    (r'^src/lib/(stripe|rate-limit|redis|email-service|sendgrid)', 4, 'payments, rate limits or email'),
+    (r'^\.github/workflows/|^ops/scripts/|(^|/)(next|drizzle)\.config\.\w+$', 3, 'automation or configuration'),
+    (r'\.(ts|tsx|js|jsx|mjs|cjs|py|sql|sh)$', 2, 'code'),
+    (r'(^|/)__tests__/|\.(test|spec)\.\w+$', 1, 'tests'),
+    (r'\.(md|mdx|txt|css|svg|json|ya?ml)$', 0.5, 'docs, styles or data'),
+]
+
+# A hunk containing any of these (lowercase) is riskier wherever it is
+RISKY_KEYWORDS = (
+    'password', 'secret', 'token', 'api_key', 'apikey', 'credential', 'session', 'cookie', 'jwt', 'crypto',
+    'eval(', 'exec(', 'dangerouslysetinnerhtml', 'innerhtml', 'sql`', '.raw(', 'execute(',
+    'subprocess', 'shell=true', 'cors', 'redirect(',
+)
+
+GENERATED_REGEX = re.compile('|'.join(f'(?:{pattern})' for pattern in GENERATED_PATTERNS))
+FILE_RISK_REGEXES = [(re.compile(pattern), weight, reason) for pattern, weight, reason in FILE_RISK_RULES]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the tokens of a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def is_generated(filename: str) -> bool:
+    """Check whether a file is generated or vendored (its diff is not worth reviewing)"""
+    return GENERATED_REGEX.search(filename) is not None
+
+
+def file_risk(filename: str) -> tuple:
+    """Get the (weight, reason) of the first risk rule matching a file path"""
+    for regex, weight, reason in FILE_RISK_REGEXES:
+        if regex.search(filename):
+            return weight, reason
+    return 1, 'other'
+
+
+def split_hunks(patch: str) -> List[str]:
+    """Split a unified diff patch into hunks, each starting with its @@ header"""
+    hunks = []
+    start = 0
+    for match in re.finditer(r'^@@', patch, re.MULTILINE):
+        if match.start() > start:
+            hunks.append(patch[start:match.start()].rstrip('\n'))
+        start = match.start()
+    hunks.append(patch[start:].rstrip('\n'))
+    return [hunk for hunk in hunks if hunk]
+
+
+def hunk_risk(file_weight: float, status: str, hunk: str) -> float:
+    """Score a hunk: its file's weight, raised for new files, added lines and risky code (added or removed)"""
+    score = file_weight
+    if status == 'added':
+        score *= 1.5
+    score += min(hunk.count('\n+'), 50) / 50
+    text = hunk.lower()
+    if any(keyword in text for keyword in RISKY_KEYWORDS):
+        score += 2
+    return score
+
+
+def pack_files(files: List[Dict], budget: int) -> List[Dict]:
+    """
+    Choose the hunks of files_changed (see reviewer.get_pr_info) to send
+    within a budget of estimated tokens.
+
+    Returns one dict per file, in the original order, with 'file' (the
+    input dict), 'generated', 'reason' (of its risk rule), 'hunks' (the
+    hunks kept, in patch order) and 'omitted' (the number of hunks left
+    out for the budget).
+    """
+    packed = []
+    candidates = []  # (score, file position, hunk position, hunk, tokens)
+    for position, file in enumerate(files):
+        weight, reason = file_risk(file['filename'])
+        entry = {'file': file, 'generated': is_generated(file['filename']), 'reason': reason, 'hunks': [], 'omitted': 0}
+        packed.append(entry)
+        if entry['generated'] or not file.get('patch'):
+            continue
+        for index, hunk in enumerate(split_hunks(file['patch'])):
+            candidates.append((hunk_risk(weight, file.get('status'), hunk), position, index, hunk, estimate_tokens(hunk)))
+
+    # Riskiest first; among equals, earlier files and hunks first
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+    kept = {}
+    remaining = budget
+    for score, position, index, hunk, tokens in candidates:
+        if tokens <= remaining:
+            kept.setdefault(position, []).append((index, hunk))
+            remaining -= tokens
+        else:
+            packed[position]['omitted'] += 1
+
+    for position, hunks in kept.items():
+        packed[position]['hunks'] = [hunk for _, hunk in sorted(hunks)]
+    return packed
+
+
+def plan_shards(files: List[Dict], budget: int) -> List[List[Dict]]:
+    """
+    Split the reviewable files of files_changed into groups of about
+    budget estimated tokens each, keeping the original (path) order so
+    files of the same directory stay together.
+
+    Generated files and files without a diff are left out. A file bigger
+    than the budget gets a group of its own (pack_files trims it later).
+    """
+    shards = []
+    current = []
+    used = 0
+    for file in files:
+        if is_generated(file['filename']) or not file.get('patch'):
+            continue
+        tokens = estimate_tokens(file['filename']) + 24 + estimate_tokens(file['patch'])
+        if current and used + tokens > budget:
+            shards.append(current)
+            current = []
+            used = 0
+        current.append(file)
+        used += tokens
+    if current:
+        shards.append(current)
+    return shards
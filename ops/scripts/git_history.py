@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Git History Loader - Reads tags and commits in a constant number of git calls
+
+Used by changelog.py to build every release section from one pass over the
+history instead of one `git log` per tag pair, and to read and write the
+release index that other scripts load instead of re-walking history.
+"""
+
+import os
+import sys
+import json
+import subprocess
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent
+OUTPUT_DIR = SCRIPT_DIR.parent / "output"
+RELEASE_INDEX_PATH = OUTPUT_DIR / "release-index.json"
+
+# Field separator for git --format output; records are NUL-separated (-z)
+FIELD_SEP = '\x1e'
+RECORD_SEP = b'\x00'
+
+# Bytes read from git's stdout at a time when streaming log output
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_tag_refs() -> list:
+    """Get all tags (newest version first) with their commit sha and date"""
+    fmt = FIELD_SEP.join([
+        '%(refname:short)',
+        '%(objectname)',
+        '%(*objectname)',
+        '%(authordate:iso-strict)',
+        '%(*authordate:iso-strict)',
+    ])
+    try:
+        result = subprocess.run(
+            ['git', 'for-each-ref', '--sort=-version:refname', f'--format={fmt}', 'refs/tags'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Error getting git tags: {e}", file=sys.stderr)
+        return []
+
+    tags = []
+    for line in result.stdout.split('\n'):
+        if not line.strip():
+            continue
+        name, sha, peeled_sha, date, peeled_date = line.split(FIELD_SEP)
+        # Annotated tags point at a tag object; use the peeled commit instead
+        date_str = peeled_date or date
+        try:
+            date = datetime.fromisoformat(date_str.replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        except ValueError:
+            date = datetime.now().strftime('%Y-%m-%d')
+        tags.append({
+            'name': name,
+            'sha': peeled_sha or sha,
+            'date': date,
+        })
+    return tags
+
+
+def parse_commit_record(record: str, with_parents: bool = False) -> dict:
+    """Parse one FIELD_SEP-delimited `git log` record into a commit dict"""
+    fields = record.split(FIELD_SEP, 4 + 2 * with_parents)
+    if with_parents:
+        sha, parents, timestamp, date, author, subject, body = fields
+    else:
+        sha, date, author, subject, body = fields
+
+    commit = {
+        'hash': sha,
+        'date': date,
+        'author': author,
+        'subject': subject,
+        'body': body.rstrip('\n'),
+    }
+    if with_parents:
+        commit['parents'] = parents.split()
+        commit['timestamp'] = int(timestamp or 0)
+    return commit
+
+
+def add_numstat(commit: dict, path: str, insertions: str, deletions: str):
+    """Add one `--numstat` file entry to a commit (binary files count as 0)"""
+    insertions = int(insertions) if insertions != '-' else 0
+    deletions = int(deletions) if deletions != '-' else 0
+    commit['files'].append(sys.intern(path))
+    commit['numstat'] += (insertions, deletions)
+    stat = commit['stat']
+    stat[0] += 1
+    stat[1] += insertions
+    stat[2] += deletions
+
+
+def iter_tokens(stream):
+    """Read a NUL-separated stream in fixed-size chunks, yielding decoded tokens"""
+    pending = b''
+    for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+        tokens = (pending + chunk).split(RECORD_SEP)
+        pending = tokens.pop()
+        for token in tokens:
+            yield token.decode('utf-8', 'replace')
+    if pending:
+        yield pending.decode('utf-8', 'replace')
+
+
+def iter_numstat_commits(tokens, with_parents: bool = False):
+    """
+    Group the tokens of `git log -z --numstat` output into commits.
+
+    A token holding FIELD_SEP starts a commit (its first file entry follows
+    the last FIELD_SEP); every other non-empty token is a file entry
+    "insertions<TAB>deletions<TAB>path". Renames leave the path empty and
+    put the old and new path in the next two tokens.
+    """
+    commit = None
+    rename = None
+    for token in tokens:
+        if rename is not None:
+            rename.append(token)
+            if len(rename) == 4:
+                add_numstat(commit, rename[3], rename[0], rename[1])
+                rename = None
+            continue
+        if FIELD_SEP in token:
+            if commit is not None:
+                yield commit
+            header, _, token = token.rpartition(FIELD_SEP)
+            commit = parse_commit_record(header, with_parents)
+            commit['files'] = []
+            commit['numstat'] = []
+            commit['stat'] = [0, 0, 0]
+            token = token.lstrip('\n')
+        if not token or commit is None:
+            continue
+        insertions, deletions, path = token.split('\t', 2)
+        if path:
+            add_numstat(commit, path, insertions, deletions)
+        else:
+            rename = [insertions, deletions]
+    if commit is not None:
+        yield commit
+
+
+def iter_commits(revisions: list, with_parents: bool = False, extra_args: list = None, with_stat: bool = False, stdin: list = None):
+    """
+    Stream commits from `git log -z`, yielding one commit dict at a time.
+
+    Records are NUL-separated and fields FIELD_SEP-separated, so subjects and
+    bodies may contain any other character. Output is read in fixed-size
+    chunks, so memory stays bounded however large the range is. With
+    with_parents, each commit also gets 'parents' and its commit
+    'timestamp'. With with_stat, the same stream also carries `--numstat`
+    and each commit gets 'files' (paths), 'numstat' (flat insertions,
+    deletions pairs, one per path) and 'stat' ([files, insertions,
+    deletions]). Revisions in stdin are written to git's standard input
+    (for `--stdin`), which keeps long lists of shas off the command line.
+    """
+    fields = ['%H', '%P', '%ct', '%aI', '%an', '%s', '%b'] if with_parents else ['%H', '%aI', '%an', '%s', '%b']
+    if with_stat:
+        # git appends the file entries after the format; an empty last
+        # field keeps them apart from the body
+        fields.append('')
+        extra_args = ['--numstat'] + (extra_args or [])
+    cmd = ['git', 'log', '-z', f'--pretty=format:{FIELD_SEP.join(fields)}']
+    cmd += (extra_args or []) + revisions
+
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if stdin is not None else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if stdin is not None:
+        # git reads all of its input before it writes any output
+        proc.stdin.write(''.join(f'{revision}\n' for revision in stdin).encode('utf-8'))
+        proc.stdin.close()
+    try:
+        tokens = iter_tokens(proc.stdout)
+        if with_stat:
+            yield from iter_numstat_commits(tokens, with_parents)
+        else:
+            for record in tokens:
+                yield parse_commit_record(record, with_parents)
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        if proc.wait() != 0 and stderr:
+            print(f"Error getting commits: {stderr.decode('utf-8', 'replace').strip()}", file=sys.stderr)
+
+
+def get_all_commits(refs: list) -> list:
+    """Get every commit reachable from refs (newest first), including parents"""
+    return list(iter_commits(refs, with_parents=True))
+
+
+def partition_commits(commits: list, tags: list, head_sha: str = None) -> dict:
+    """
+    Assign each commit to the oldest tag that contains it.
+
+    Tags are walked oldest first and each walk stops at commits an older tag
+    already claimed, so every commit is visited once. For a linear release
+    history this matches `git log <previous_tag>..<tag>` for every tag pair.
+    Merge commits are used for the walk but left out of the result, like
+    `--no-merges`.
+    """
+    by_hash = {commit['hash']: commit for commit in commits}
+    owner = {}
+
+    starts = [(tag['name'], tag['sha']) for tag in reversed(tags)]
+    if head_sha:
+        starts.append((None, head_sha))
+
+    for label, start in starts:
+        queue = deque([start])
+        while queue:
+            sha = queue.popleft()
+            if sha in owner or sha not in by_hash:
+                continue
+            owner[sha] = label
+            queue.extend(by_hash[sha]['parents'])
+
+    ranges = {tag['name']: [] for tag in tags}
+    unreleased = []
+    for commit in commits:
+        if len(commit['parents']) > 1 or commit['hash'] not in owner:
+            continue
+        label = owner[commit['hash']]
+        if label is None:
+            unreleased.append(commit)
+        else:
+            ranges[label].append(commit)
+
+    return {'ranges': ranges, 'unreleased': unreleased}
+
+
+def load_history(head: str = 'HEAD', tags: list = None, exclude: list = None) -> dict:
+    """
+    Load tags, tag dates and all commits split into tag ranges.
+
+    Runs three git commands no matter how many tags the repository has.
+    Commits reachable from any sha in `exclude` are not read at all; their
+    tag ranges come back empty.
+    """
+    if tags is None:
+        tags = get_tag_refs()
+
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', head],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        head_sha = result.stdout.strip()
+    except subprocess.CalledProcessError:
+        head_sha = None
+
+    refs = [head] if head_sha else []
+    if tags:
+        refs.append('--tags')
+    if refs and exclude:
+        refs.extend(f'^{sha}' for sha in exclude)
+    commits = get_all_commits(refs) if refs else []
+
+    partitioned = partition_commits(commits, tags, head_sha)
+    return {
+        'tags': tags,
+        'head': head_sha,
+        'ranges': partitioned['ranges'],
+        'unreleased': partitioned['unreleased'],
+    }
+
+
+def load_release_index(index_path: Path = RELEASE_INDEX_PATH) -> dict:
+    """
+    Load the release index written by `changelog.py --all`.
+
+    The index maps every tag to its date, commit sha, previous tag and the
+    ids of its commits by category, so other scripts can look up release
+    contents without walking git history. Returns an empty index if the
+    file is missing or unreadable.
+    """
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'releases': {}, 'unreleased': {}}
+
+
+def save_release_index(index: dict, index_path: Path = RELEASE_INDEX_PATH):
+    """Save the release index, replacing the old file in one step"""
+    try:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_name(f".{index_path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"Warning: Could not save release index: {e}", file=sys.stderr)
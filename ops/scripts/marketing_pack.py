@@ -17,6 +17,9 @@ from datetime import datetime
 from dotenv import load_dotenv
 from github import Github
 from openai import OpenAI
+from commit_categories import MARKETING_RULES, load_categorizer
+from commit_index import COMMIT_INDEX_PATH, CommitIndex, largest_changes
+from response_cache import create_cached, disable_cache_reads
 
 # Load environment variables
 load_dotenv()
@@ -28,12 +31,19 @@ GITHUB_REPO = os.getenv("GITHUB_REPO", "brock-nelson/costudy-website")
 GITHUB_OWNER = os.getenv("GITHUB_OWNER", "brock-nelson")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "4000"))
+TOP_CHANGES = int(os.getenv("MARKETING_TOP_CHANGES", "5"))
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
 PROMPTS_DIR = SCRIPT_DIR.parent / "prompts"
 OUTPUT_DIR = SCRIPT_DIR.parent / "output"
 
+# Commit categorizer; replaced in main() when --categories is given
+CATEGORIZER = load_categorizer(os.getenv("MARKETING_CATEGORIES"), MARKETING_RULES)
+
+# Shared commit index; opened on first use
+COMMIT_INDEX = None
+
 
 def load_prompt(prompt_name: str) -> str:
     """Load a prompt template from the prompts directory"""
@@ -45,44 +55,26 @@ def load_prompt(prompt_name: str) -> str:
         return f.read()
 
 
-def get_git_commits(from_ref: str, to_ref: str) -> list:
-    """Get git commits between two references"""
-    try:
-        # Get commit messages with format: hash|date|author|subject
-        cmd = [
-            'git', 'log',
-            f'{from_ref}..{to_ref}',
-            '--pretty=format:%H|%aI|%an|%s',
-            '--no-merges'
-        ]
+def get_commit_index() -> CommitIndex:
+    """Get the shared commit index (see commit_index.py)"""
+    global COMMIT_INDEX
+    if COMMIT_INDEX is None:
+        COMMIT_INDEX = CommitIndex(COMMIT_INDEX_PATH)
+    return COMMIT_INDEX
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        commits = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                hash, date, author, subject = line.split('|', 3)
-                commits.append({
-                    'hash': hash,
-                    'date': date,
-                    'author': author,
-                    'subject': subject,
-                })
 
-        return commits
-
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting git commits: {e}", file=sys.stderr)
+def get_git_commits(from_ref: str, to_ref: str) -> list:
+    """Get git commits between two references"""
+    commits = get_commit_index().query(from_ref, to_ref)
+    if commits is None:
+        print(f"Error getting git commits for {from_ref}..{to_ref}", file=sys.stderr)
         sys.exit(1)
+    return commits
 
 
-def get_git_diff_stats(from_ref: str, to_ref: str) -> dict:
-    """Get diff statistics between two references"""
+def get_git_diff_stats(from_ref: str, to_ref: str, commits: list) -> dict:
+    """Get diff statistics between two references and the biggest changes among commits"""
+    stats = {'files_changed': 0, 'insertions': 0, 'deletions': 0, 'text': ''}
     try:
         cmd = ['git', 'diff', '--shortstat', from_ref, to_ref]
         result = subprocess.run(
@@ -94,12 +86,7 @@ def get_git_diff_stats(from_ref: str, to_ref: str) -> dict:
 
         # Parse output like "5 files changed, 123 insertions(+), 45 deletions(-)"
         stats_text = result.stdout.strip()
-        stats = {
-            'files_changed': 0,
-            'insertions': 0,
-            'deletions': 0,
-            'text': stats_text,
-        }
+        stats['text'] = stats_text
 
         if 'file' in stats_text:
             parts = stats_text.split(',')
@@ -111,45 +98,40 @@ def get_git_diff_stats(from_ref: str, to_ref: str) -> dict:
                 elif 'deletion' in part:
                     stats['deletions'] = int(part.split()[0])
 
-        return stats
-
     except subprocess.CalledProcessError as e:
         print(f"Error getting diff stats: {e}", file=sys.stderr)
-        return {'files_changed': 0, 'insertions': 0, 'deletions': 0, 'text': ''}
+
+    # Per-commit line counts: a line changed by several commits counts
+    # once per commit here, unlike in the net totals above
+    stats['largest'] = largest_changes(commits, TOP_CHANGES)
+    return stats
 
 
 def categorize_commits(commits: list) -> dict:
     """Categorize commits by type"""
-    categories = {
-        'features': [],
-        'fixes': [],
-        'improvements': [],
-        'docs': [],
-        'other': [],
-    }
-
-    feature_keywords = ['add', 'new', 'feature', 'implement']
-    fix_keywords = ['fix', 'bug', 'patch', 'resolve']
-    improvement_keywords = ['update', 'improve', 'enhance', 'optimize', 'refactor']
-    docs_keywords = ['doc', 'readme', 'comment']
-
-    for commit in commits:
-        subject_lower = commit['subject'].lower()
-
-        if any(kw in subject_lower for kw in feature_keywords):
-            categories['features'].append(commit)
-        elif any(kw in subject_lower for kw in fix_keywords):
-            categories['fixes'].append(commit)
-        elif any(kw in subject_lower for kw in improvement_keywords):
-            categories['improvements'].append(commit)
-        elif any(kw in subject_lower for kw in docs_keywords):
-            categories['docs'].append(commit)
-        else:
-            categories['other'].append(commit)
-
+    # Custom rule files may not define every category used in the context
+    categories = {category: [] for category in MARKETING_RULES['categories']}
+    categories.update(CATEGORIZER.categorize_batch(commits))
     return categories
 
 
+def format_largest_changes(largest: dict) -> str:
+    """Format the biggest commits and files of a release for the AI context"""
+    if not largest or not largest['commits']:
+        return ''
+
+    context = "\n**Biggest Changes (by lines changed):**\n"
+    for commit, insertions, deletions in largest['commits']:
+        context += f"- {commit['subject']} ({commit['hash'][:7]}, +{insertions}/-{deletions})\n"
+
+    if largest['files']:
+        context += "\n**Most Changed Files:**\n"
+        for path, insertions, deletions in largest['files']:
+            context += f"- {path} (+{insertions}/-{deletions})\n"
+
+    return context
+
+
 def format_changes_context(version: str, from_ref: str, to_ref: str, commits: list, categories: dict, stats: dict) -> str:
     """Format changes into context for AI"""
     context = f"""
@@ -163,7 +145,7 @@ def format_changes_context(version: str, from_ref: str, to_ref: str, commits: li
 - Insertions: +{stats['insertions']}
 - Deletions: -{stats['deletions']}
 - Total commits: {len(commits)}
-
+{format_largest_changes(stats.get('largest'))}
 **New Features ({len(categories['features'])}):**
 """
 
@@ -208,6 +190,7 @@ Please create:
    - Instagram caption (casual, engaging)
 
 Focus on benefits to students, professors, and administrators. Use the CoStudy brand voice.
+In the release notes, call out the biggest changes listed above.
 """
 
     try:
@@ -216,7 +199,8 @@ Focus on benefits to students, professors, and administrators. Use the CoStudy b
         # Combine marketing prompt and brand voice
         system_prompt = f"{marketing_prompt}\n\n---\n\n{brand_voice}"
 
-        response = client.chat.completions.create(
+        response = create_cached(
+            client.chat.completions,
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -224,7 +208,7 @@ Focus on benefits to students, professors, and administrators. Use the CoStudy b
             ],
             max_tokens=OPENAI_MAX_TOKENS,
             temperature=0.7
-        )
+        ).parse()
 
         content = response.choices[0].message.content
 
@@ -332,9 +316,16 @@ def get_latest_tag() -> str:
 @click.option('--from', 'from_ref', help='Starting reference (tag, branch, or commit)')
 @click.option('--to', 'to_ref', default='HEAD', help='Ending reference (default: HEAD)')
 @click.option('--output', '-o', type=click.Path(), help='Output directory (optional)')
+@click.option('--categories', type=click.Path(exists=True), help='JSON file with commit category rules')
+@click.option('--no-cache', is_flag=True, help='Call the API even if the same request was answered before')
 @click.option('--debug', is_flag=True, help='Enable debug output')
-def main(version: str, from_ref: str, to_ref: str, output: str, debug: bool):
+def main(version: str, from_ref: str, to_ref: str, output: str, categories: str, no_cache: bool, debug: bool):
     """Generate marketing content pack for a release"""
+    global CATEGORIZER
+    if no_cache:
+        disable_cache_reads()
+    if categories:
+        CATEGORIZER = load_categorizer(categories)
 
     # Validate environment
     if not OPENAI_API_KEY:
@@ -377,7 +368,7 @@ def main(version: str, from_ref: str, to_ref: str, output: str, debug: bool):
     # Get git changes
     print(f"Analyzing changes from {from_ref} to {to_ref}...")
     commits = get_git_commits(from_ref, to_ref)
-    stats = get_git_diff_stats(from_ref, to_ref)
+    stats = get_git_diff_stats(from_ref, to_ref, commits)
     categories = categorize_commits(commits)
 
     print(f"✓ Found {len(commits)} commits")
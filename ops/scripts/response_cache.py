@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Response Cache - Content-addressed cache of AI model responses
+
+Used by reviewer.py, spec_writer.py, marketing_pack.py and both content
+generators so that re-running a step with unchanged inputs (e.g. retrying
+a failed workflow) returns the earlier response instantly and at no cost.
+
+A response is keyed by a hash of the endpoint and every request parameter
+(model, messages, temperature, max_tokens, ...) and stored as one JSON file
+under output/response-cache/ (RESPONSE_CACHE_DIR overrides the path, an
+empty value turns caching off). Entries expire after RESPONSE_CACHE_TTL
+seconds; when the cache grows past RESPONSE_CACHE_MAX_MB the least
+recently used entries are evicted.
+
+    raw = create_cached(client.chat.completions, model=..., messages=[...])
+    response = raw.parse()
+    if not raw.cached:
+        record_cost(...)
+
+Scripts offer --no-cache, which skips reads (the fresh response still
+replaces the cached one).
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import importlib
+import threading
+from pathlib import Path
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent
+OUTPUT_DIR = SCRIPT_DIR.parent / "output"
+_cache_dir = os.getenv("RESPONSE_CACHE_DIR", str(OUTPUT_DIR / "response-cache"))
+RESPONSE_CACHE_DIR = Path(_cache_dir) if _cache_dir else None
+
+# Entries older than this (seconds) are not used
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))
+# Least recently used entries are evicted above this size
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", "100"))
+
+# Bump whenever the entry layout changes so that old entries are missed
+CACHE_FORMAT = 1
+
+# Eviction stops once the cache is this fraction of the limit, so that
+# it does not run again on the next write
+EVICT_TO = 0.8
+
+
+class CachedCall:
+    """
+    The result of create_cached: parse() returns the response object as
+    the SDK's raw responses do, with the retries taken, the response
+    headers and whether it came from the cache.
+    """
+
+    def __init__(self, response, retries_taken: int = 0, headers=None, cached: bool = False):
+        self._response = response
+        self.retries_taken = retries_taken
+        self.headers = headers if headers is not None else {}
+        self.cached = cached
+
+    def parse(self):
+        return self._response
+
+
+class ResponseCache:
+    """
+    Directory of cached responses, one <key>.json file per request. A
+    file's mtime is its last use, which drives LRU eviction.
+    """
+
+    def __init__(self, path: Path = RESPONSE_CACHE_DIR, ttl: int = RESPONSE_CACHE_TTL, max_mb: float = RESPONSE_CACHE_MAX_MB):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # Skip reads (--no-cache); responses are still stored
+        self.bypass = False
+        self._size = None  # Bytes on disk, counted on the first write
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint, params: dict) -> str:
+        """Hash an endpoint (e.g. client.chat.completions) and its request parameters"""
+        endpoint_name = f"{type(endpoint).__module__}.{type(endpoint).__qualname__}"
+        text = json.dumps([CACHE_FORMAT, endpoint_name, params], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        """Get the cached response object for key (None if missing, expired or unreadable)"""
+        if not self.path or self.bypass:
+            return None
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if time.time() - entry['created'] > self.ttl:
+                entry_path.unlink()
+                return None
+            module_name, _, class_name = entry['type'].rpartition('.')
+            response_class = getattr(importlib.import_module(module_name), class_name)
+            response = response_class.model_validate(entry['response'])
+            os.utime(entry_path)  # Mark as recently used
+            return response
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable cache entry {entry_path.name}: {e}", file=sys.stderr)
+            return None
+
+    def put(self, key: str, response):
+        """Store a response object (a pydantic model of the OpenAI or Anthropic SDK)"""
+        if not self.path:
+            return
+        entry = {
+            'format': CACHE_FORMAT,
+            'created': time.time(),
+            'type': f"{type(response).__module__}.{type(response).__qualname__}",
+            'response': json.loads(response.model_dump_json()),
+        }
+        entry_path = self.entry_path(key)
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            data = json.dumps(entry).encode('utf-8')
+            tmp_path = entry_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"Warning: Could not write response cache: {e}", file=sys.stderr)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def _entries(self):
+        """Yield (path, size, mtime) of every cache entry"""
+        if not self.path.exists():
+            return
+        for directory in os.scandir(self.path):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield Path(entry.path), stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """Delete expired entries, then the least recently used until the cache is under EVICT_TO of its limit"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(size for _, size, _ in entries)
+        expired_before = time.time() - self.ttl
+        for path, entry_size, mtime in entries:
+            if mtime >= expired_before and size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def create_cached(endpoint, cache: ResponseCache = RESPONSE_CACHE, **params) -> CachedCall:
+    """
+    Call endpoint.with_raw_response.create(**params) (e.g. with
+    client.chat.completions or anthropic_client.messages) unless the
+    same request is cached.
+    """
+    key = cache.key(endpoint, params)
+    response = cache.get(key)
+    if response is not None:
+        return CachedCall(response, cached=True)
+
+    raw = endpoint.with_raw_response.create(**params)
+    response = raw.parse()
+    cache.put(key, response)
+    return CachedCall(response, raw.retries_taken, raw.headers)
+
+
+def disable_cache_reads():
+    """Always call the API (--no-cache); fresh responses still replace cached ones"""
+    RESPONSE_CACHE.bypass = True
@@ -5,15 +5,34 @@ Code Reviewer Bot - Automated code review for GitHub pull requests
 Usage:
     python reviewer.py --pr 123
     python reviewer.py --pr 123 --output review.md
+    python reviewer.py --pr 123 --jobs 8
+    python reviewer.py --pr 123 --full
+
+Each posted review records the head commit it reviewed in a hidden
+marker; later runs review only the commits pushed since (--full reviews
+the whole pull request again).
+
+Pull requests whose diff does not fit in the context budget are reviewed
+in shards: groups of files are reviewed concurrently and the findings are
+merged into one review by a final call.
 """
 
 import os
+import re
 import sys
+import time
 import click
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 from github import Github
 from openai import OpenAI
+from cost_ledger import record_usage
+from diff_packer import estimate_tokens, is_generated, pack_files, plan_shards
+from response_cache import create_cached, disable_cache_reads
 
 # Load environment variables
 load_dotenv()
@@ -22,8 +41,35 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITHUB_REPO = os.getenv("GITHUB_REPO", "brock-nelson/costudy-website")
+# Login the reviews are posted as; only its review markers are trusted.
+# The default is the account of the Actions GITHUB_TOKEN, which cannot
+# look itself up (GET /user is not accessible to integrations)
+REVIEWER_BOT_LOGIN = os.getenv("REVIEWER_BOT_LOGIN", "github-actions[bot]")
+# GitHub Actions sets both; GitHub Enterprise Server serves the REST API
+# under /api/v3 and GraphQL under /api/graphql
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL") or (
+    GITHUB_API_URL[:-len('/v3')] + '/graphql' if GITHUB_API_URL.endswith('/api/v3') else GITHUB_API_URL + '/graphql'
+)
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
 OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "4000"))
+# Estimated tokens of PR context (description and diffs) sent for review
+REVIEW_CONTEXT_TOKENS = int(os.getenv("REVIEW_CONTEXT_TOKENS", "24000"))
+# Shards of an oversized pull request reviewed at once
+REVIEW_JOBS = int(os.getenv("REVIEW_JOBS", "4"))
+
+# GitHub API requests made at once when fetching a PR, the page size of
+# its changed files, and the most files GitHub lists for one PR
+PR_FETCH_JOBS = 8
+GITHUB_FILES_PER_PAGE = 100
+GITHUB_MAX_PR_FILES = 3000
+# Files a commit comparison lists at most; longer lists are cut off
+GITHUB_MAX_COMPARE_FILES = 300
+GITHUB_TIMEOUT = 30
+
+# Hidden marker in posted reviews recording the head commit reviewed
+REVIEW_MARKER = "<!-- costudy-reviewer head={sha} -->"
+REVIEW_MARKER_REGEX = re.compile(r'<!-- costudy-reviewer head=([0-9a-f]{40}) -->')
 
 # Paths
 SCRIPT_DIR = Path(__file__).parent
@@ -41,49 +87,216 @@ def load_prompt(prompt_name: str) -> str:
         return f.read()
 
 
+PR_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      number title body url createdAt updatedAt
+      additions deletions changedFiles
+      author { login }
+      baseRefName headRefName headRefOid
+      labels(first: 100) { nodes { name } }
+    }
+  }
+}
+"""
+
+
 def get_pr_info(repo, pr_number: int) -> dict:
-    """Fetch PR information from GitHub"""
+    """
+    Fetch PR information from GitHub.
+
+    repo is a PyGithub Repository (a lazy one is enough) or an
+    "owner/name" string.
+
+    The PR metadata (one GraphQL query) and the first page of changed
+    files are requested at once; the remaining file pages, whose number
+    is then known, are all requested concurrently. No request is spent
+    looking up the repository first.
+    """
     try:
-        pr = repo.get_pull(pr_number)
+        repo_name = repo if isinstance(repo, str) else repo.full_name
+        repo_url = f"{GITHUB_API_URL}/repos/{repo_name}"
+        session = github_session()
+        with ThreadPoolExecutor(max_workers=PR_FETCH_JOBS) as pool:
+            metadata = pool.submit(get_pr_metadata, session, repo_name, pr_number)
+            first_page = pool.submit(get_pr_files_page, session, repo_url, pr_number, 1)
+            pr_info = metadata.result()
+
+            pages = -(-min(pr_info['changed_files_count'], GITHUB_MAX_PR_FILES) // GITHUB_FILES_PER_PAGE)
+            rest = pool.map(lambda page: get_pr_files_page(session, repo_url, pr_number, page), range(2, pages + 1))
+            files = first_page.result() + [file for page in rest for file in page]
+
+        pr_info['files_changed'] = [file_info(file) for file in files]
+        return pr_info
+    except Exception as e:
+        print(f"Error fetching PR #{pr_number}: {e}", file=sys.stderr)
+        sys.exit(1)
 
-        # Get labels
-        labels = [label.name for label in pr.labels]
-
-        # Get files changed
-        files_changed = []
-        for file in pr.get_files():
-            files_changed.append({
-                'filename': file.filename,
-                'status': file.status,
-                'additions': file.additions,
-                'deletions': file.deletions,
-                'changes': file.changes,
-                'patch': file.patch if hasattr(file, 'patch') else None,
-            })
 
+def github_session():
+    """Create a requests session for the GitHub API, pooling a connection per concurrent fetch"""
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=PR_FETCH_JOBS))
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=PR_FETCH_JOBS))
+    session.headers['Accept'] = 'application/vnd.github+json'
+    if GITHUB_TOKEN:
+        session.headers['Authorization'] = f"Bearer {GITHUB_TOKEN}"
+    return session
+
+
+def get_pr_metadata(session, full_name: str, pr_number: int) -> dict:
+    """
+    Get everything but the changed files of a PR with one GraphQL query
+    (GraphQL needs a token; without one the REST pull request is read).
+    """
+    if not GITHUB_TOKEN:
+        response = session.get(f"{GITHUB_API_URL}/repos/{full_name}/pulls/{pr_number}", timeout=GITHUB_TIMEOUT)
+        response.raise_for_status()
+        pr = response.json()
         return {
-            'number': pr.number,
-            'title': pr.title,
-            'body': pr.body or "No description provided.",
-            'labels': labels,
-            'author': pr.user.login,
-            'created_at': pr.created_at.isoformat(),
-            'updated_at': pr.updated_at.isoformat(),
-            'url': pr.html_url,
-            'base_branch': pr.base.ref,
-            'head_branch': pr.head.ref,
-            'files_changed': files_changed,
-            'additions': pr.additions,
-            'deletions': pr.deletions,
-            'changed_files_count': pr.changed_files,
+            'number': pr['number'],
+            'title': pr['title'],
+            'body': pr['body'] or "No description provided.",
+            'labels': [label['name'] for label in pr['labels']],
+            'author': (pr.get('user') or {}).get('login', 'ghost'),
+            'created_at': parse_github_time(pr['created_at']),
+            'updated_at': parse_github_time(pr['updated_at']),
+            'url': pr['html_url'],
+            'base_branch': pr['base']['ref'],
+            'head_branch': pr['head']['ref'],
+            'head_sha': pr['head']['sha'],
+            'additions': pr['additions'],
+            'deletions': pr['deletions'],
+            'changed_files_count': pr['changed_files'],
         }
+
+    owner, name = full_name.split('/')
+    response = session.post(
+        GITHUB_GRAPHQL_URL,
+        json={'query': PR_QUERY, 'variables': {'owner': owner, 'name': name, 'number': pr_number}},
+        timeout=GITHUB_TIMEOUT
+    )
+    response.raise_for_status()
+    result = response.json()
+    if result.get('errors'):
+        raise RuntimeError('; '.join(error['message'] for error in result['errors']))
+    pr = result['data']['repository']['pullRequest']
+    return {
+        'number': pr['number'],
+        'title': pr['title'],
+        'body': pr['body'] or "No description provided.",
+        'labels': [label['name'] for label in pr['labels']['nodes']],
+        'author': (pr.get('author') or {}).get('login', 'ghost'),
+        'created_at': parse_github_time(pr['createdAt']),
+        'updated_at': parse_github_time(pr['updatedAt']),
+        'url': pr['url'],
+        'base_branch': pr['baseRefName'],
+        'head_branch': pr['headRefName'],
+        'head_sha': pr['headRefOid'],
+        'additions': pr['additions'],
+        'deletions': pr['deletions'],
+        'changed_files_count': pr['changedFiles'],
+    }
+
+
+def get_pr_files_page(session, repo_url: str, pr_number: int, page: int) -> list:
+    """Get one page of the changed files of a PR (GitHub API JSON)"""
+    response = session.get(
+        f"{repo_url}/pulls/{pr_number}/files",
+        params={'per_page': GITHUB_FILES_PER_PAGE, 'page': page},
+        timeout=GITHUB_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def parse_github_time(text: str) -> str:
+    """Convert a GitHub timestamp ('2024-01-01T00:00:00Z') to ISO format with a UTC offset"""
+    return datetime.fromisoformat(text.replace('Z', '+00:00')).isoformat()
+
+
+def file_info(file: dict) -> dict:
+    """Get the files_changed entry of a changed file of the GitHub API (PR files or a comparison)"""
+    return {
+        'filename': file['filename'],
+        'status': file['status'],
+        'additions': file['additions'],
+        'deletions': file['deletions'],
+        'changes': file['changes'],
+        'patch': file.get('patch'),
+    }
+
+
+def get_last_reviewed_sha(repo, pr_number: int, bot_login: str = REVIEWER_BOT_LOGIN) -> str:
+    """
+    Get the head commit recorded by the latest review bot_login posted on
+    a PR (None if never reviewed). Markers in anyone else's comments are
+    ignored, so they cannot narrow the next review.
+    """
+    try:
+        last_sha = None
+        for comment in repo.get_pull(pr_number).get_issue_comments():
+            if comment.user is None or comment.user.login != bot_login:
+                continue
+            match = REVIEW_MARKER_REGEX.search(comment.body or '')
+            if match:
+                last_sha = match.group(1)
+        return last_sha
     except Exception as e:
-        print(f"Error fetching PR #{pr_number}: {e}", file=sys.stderr)
-        sys.exit(1)
+        print(f"Warning: Could not read earlier reviews of PR #{pr_number}: {e}", file=sys.stderr)
+        return None
+
 
+def get_changes_since(repo, pr_info: dict, since_sha: str) -> dict:
+    """
+    Narrow pr_info to the changes between since_sha and the PR head.
 
-def format_pr_context(pr_info: dict) -> str:
-    """Format PR information into a context string for the AI"""
+    Returns None, after saying why, when the comparison would not show
+    exactly the changes pushed to the PR since since_sha: the branch was
+    rebased or force-pushed (the head does not descend from since_sha),
+    the base branch was merged in since (its changes would be reviewed as
+    the PR's), or GitHub truncated the file list. The whole PR needs
+    review then.
+    """
+    try:
+        comparison = repo.compare(since_sha, pr_info['head_sha'])
+        if comparison.status != 'ahead':
+            print(f"Last reviewed commit {since_sha[:7]} is not in this branch's history")
+            return None
+        if any(len(commit.parents) > 1 for commit in comparison.commits):
+            print(f"A merge was pushed since {since_sha[:7]}")
+            return None
+        files = list(comparison.files)
+    except Exception as e:
+        print(f"Warning: Could not compare {since_sha[:7]}...{pr_info['head_sha'][:7]}: {e}", file=sys.stderr)
+        return None
+    if len(files) >= GITHUB_MAX_COMPARE_FILES:
+        print(f"More than {GITHUB_MAX_COMPARE_FILES - 1} files changed since {since_sha[:7]}")
+        return None
+
+    files_changed = [file_info(file.raw_data) for file in files]
+    return dict(
+        pr_info,
+        files_changed=files_changed,
+        additions=sum(file['additions'] for file in files_changed),
+        deletions=sum(file['deletions'] for file in files_changed),
+        changed_files_count=len(files_changed),
+        since_sha=since_sha,
+        commits_since=comparison.total_commits,
+    )
+
+
+def format_pr_context(pr_info: dict, token_budget: int = REVIEW_CONTEXT_TOKENS) -> str:
+    """
+    Format PR information into a context string for the AI.
+
+    Every file is listed, but only the riskiest diff hunks that fit in
+    token_budget (estimated, including the PR description) are included.
+    Generated files such as lockfiles never get their diff (see
+    diff_packer.py). Other files are tagged with the risk category that
+    ranked their hunks.
+    """
     context = f"""
 **Pull Request #{pr_info['number']}: {pr_info['title']}**
 
@@ -93,7 +306,7 @@ def format_pr_context(pr_info: dict) -> str:
 **Author:** {pr_info['author']}
 **Branch:** {pr_info['head_branch']} → {pr_info['base_branch']}
 **Labels:** {', '.join(pr_info['labels']) if pr_info['labels'] else 'None'}
-
+{format_since(pr_info)}
 **Changes Summary:**
 - Files changed: {pr_info['changed_files_count']}
 - Additions: +{pr_info['additions']}
@@ -102,29 +315,37 @@ def format_pr_context(pr_info: dict) -> str:
 **Files Changed:**
 """
 
-    for file in pr_info['files_changed']:
-        context += f"\n### {file['filename']} ({file['status']})\n"
-        context += f"Changes: +{file['additions']} -{file['deletions']}\n"
-
-        if file['patch']:
-            context += f"\n```diff\n{file['patch']}\n```\n"
+    # Every file is at least listed (about 24 tokens plus its name); the
+    # rest of the budget goes to the diffs
+    sections = [context]
+    listing = sum(estimate_tokens(file['filename']) + 24 for file in pr_info['files_changed'])
+    diff_budget = token_budget - estimate_tokens(context) - listing
+
+    others = []
+    for entry in pack_files(pr_info['files_changed'], diff_budget):
+        file = entry['file']
+        summary = f"{file['filename']} ({file['status']}, +{file['additions']} -{file['deletions']})"
+        if entry['generated']:
+            others.append(f"- {summary}: generated or vendored")
+        elif not file['patch']:
+            others.append(f"- {summary} [{entry['reason']}]: binary or no diff available")
+        elif not entry['hunks']:
+            others.append(f"- {summary} [{entry['reason']}]: omitted to fit the review budget")
         else:
-            context += "\n(Binary file or no diff available)\n"
-
-    return context
+            hunks = '\n'.join(entry['hunks'])
+            sections.append(f"\n### {file['filename']} ({file['status']}, {entry['reason']})\n")
+            sections.append(f"Changes: +{file['additions']} -{file['deletions']}\n")
+            sections.append(f"\n```diff\n{hunks}\n```\n")
+            if entry['omitted']:
+                sections.append(f"\n({entry['omitted']} lower-risk hunk(s) omitted to fit the review budget)\n")
 
+    if others:
+        sections.append("\n**Other files changed (diff not included):**\n")
+        sections.append('\n'.join(others) + '\n')
+    return ''.join(sections)
 
-def generate_review(pr_info: dict, reviewer_prompt: str) -> dict:
-    """Generate a code review using OpenAI"""
-
-    # Build the context for the AI
-    pr_context = format_pr_context(pr_info)
-
-    user_message = f"""
-Please review the following pull request and provide comprehensive feedback:
-
-{pr_context}
 
+REVIEW_FOCUS = """
 Focus on:
 - Security vulnerabilities (CRITICAL)
 - Performance issues (HIGH)
@@ -135,20 +356,200 @@ Focus on:
 Provide specific, actionable feedback with file names and line numbers where applicable.
 """
 
+
+class RateLimiter:
+    """
+    Holds back requests from concurrent shards while the OpenAI token rate
+    limit is spent, using the x-ratelimit-* headers of earlier responses.
+    429 responses that still happen are retried by the OpenAI client.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self):
+        """Sleep until the rate limit is expected to have reset"""
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def update(self, headers, tokens_needed: int):
+        """Pause further requests if fewer than tokens_needed tokens remain in this window"""
+        remaining = headers.get('x-ratelimit-remaining-tokens')
+        reset = headers.get('x-ratelimit-reset-tokens')
+        if remaining is None or reset is None or int(remaining) >= tokens_needed:
+            return
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + parse_duration(reset))
+
+
+def parse_duration(text: str) -> float:
+    """Parse an OpenAI rate limit reset time such as '20ms', '1.5s' or '6m0s' into seconds"""
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', text))
+
+
+def request_review(client, reviewer_prompt: str, user_message: str, limiter: RateLimiter = None) -> str:
+    """Send one review request to OpenAI, log it to the cost ledger and return the review text"""
+    if limiter:
+        limiter.wait()
+    started = time.monotonic()
+    raw = create_cached(
+        client.chat.completions,
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": reviewer_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        max_tokens=OPENAI_MAX_TOKENS,
+        temperature=0.3  # Lower temperature for more consistent, focused reviews
+    )
+    response = raw.parse()
+    if not raw.cached:
+        record_usage("review", OPENAI_MODEL, response.usage, "reviewer", time.monotonic() - started, raw.retries_taken)
+    if limiter:
+        limiter.update(raw.headers, estimate_tokens(reviewer_prompt + user_message) + OPENAI_MAX_TOKENS)
+    return response.choices[0].message.content
+
+
+def group_reviews(reviews: list, budget: int) -> list:
+    """
+    Split (first part, last part, heading, review) entries into consecutive
+    groups of about budget tokens. Groups hold at least two entries (but
+    the last may hold one), so every round of merging shrinks the list.
+    """
+    groups, group, tokens = [], [], 0
+    for entry in reviews:
+        size = estimate_tokens(entry[2]) + estimate_tokens(entry[3])
+        if len(group) >= 2 and tokens + size > budget:
+            groups.append(group)
+            group, tokens = [], 0
+        group.append(entry)
+        tokens += size
+    if group:
+        groups.append(group)
+    return groups
+
+
+def format_reviews(group: list) -> str:
+    """Format part reviews for a merge request"""
+    return '\n\n'.join(f"## {heading}\n\n{review}" for _, _, heading, review in group)
+
+
+def review_shards(client, pr_info: dict, reviewer_prompt: str, shards: list, context_tokens: int, jobs: int) -> str:
+    """
+    Review each group of files separately, up to jobs at once, then merge
+    the findings into one review with a final request.
+
+    The part reviews given to one merge request are capped at about
+    context_tokens: when they add up to more, groups of them are merged
+    first (up to jobs at once), round after round, until the rest fits.
+    """
+    limiter = RateLimiter()
+
+    def review_shard(numbered):
+        number, files = numbered
+        shard_info = dict(pr_info, files_changed=files)
+        user_message = f"""
+Please review part {number} of {len(shards)} of the following pull request. Only the files of this part are shown; other parts are reviewed separately.
+
+{format_pr_context(shard_info, context_tokens)}
+{REVIEW_FOCUS}"""
+        return request_review(client, reviewer_prompt, user_message, limiter)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        reviews = list(pool.map(review_shard, enumerate(shards, 1)))
+
+    skipped = [file['filename'] for file in pr_info['files_changed'] if is_generated(file['filename']) or not file['patch']]
+    intro = f"""
+The following pull request was reviewed in {len(shards)} parts. Merge the reviews of the parts below into one review of the whole pull request, in the same format:
+- Remove duplicate findings and combine findings that share a cause
+- Keep file names and line numbers
+- Order findings by priority, CRITICAL first
+- Write one overall summary and recommendation
+
+**Pull Request #{pr_info['number']}: {pr_info['title']}**
+
+**Description:**
+{pr_info['body']}
+{format_since(pr_info)}
+**Changes Summary:**
+- Files changed: {pr_info['changed_files_count']} ({len(skipped)} generated, binary or without a diff were not reviewed)
+- Additions: +{pr_info['additions']}
+- Deletions: -{pr_info['deletions']}
+
+"""
+    reviews = [
+        (number, number, f"Part {number} ({len(files)} files: {', '.join(file['filename'] for file in files[:10])}{', ...' if len(files) > 10 else ''})", review)
+        for number, (files, review) in enumerate(zip(shards, reviews), 1)
+    ]
+
+    def merge_group(group):
+        if len(group) == 1:
+            return group[0]
+        first, last = group[0][0], group[-1][1]
+        user_message = f"""
+The following pull request was reviewed in {len(shards)} parts. Merge the reviews of parts {first} to {last} below into one review of those parts, in the same format. Remove duplicate findings and combine findings that share a cause, but keep every other finding with its file names and line numbers; the overall summary is written later.
+
+**Pull Request #{pr_info['number']}: {pr_info['title']}**
+
+{format_reviews(group)}
+"""
+        return (first, last, f"Parts {first} to {last}", request_review(client, reviewer_prompt, user_message, limiter))
+
+    budget = context_tokens - estimate_tokens(reviewer_prompt + intro)
+    groups = group_reviews(reviews, budget)
+    while len(groups) > 1:
+        print(f"  Merging {len(reviews)} part reviews in {len(groups)} groups")
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            reviews = list(pool.map(merge_group, groups))
+        groups = group_reviews(reviews, budget)
+
+    return request_review(client, reviewer_prompt, intro + format_reviews(reviews) + '\n', limiter)
+
+
+def format_since(pr_info: dict) -> str:
+    """Describe an incremental review's range for the context (empty for a full review)"""
+    if not pr_info.get('since_sha'):
+        return ''
+    return (
+        f"\n**Incremental review:** only the {pr_info['commits_since']} commit(s) pushed since the last review "
+        f"({pr_info['since_sha'][:7]}..{pr_info['head_sha'][:7]}) are shown; earlier changes were already reviewed.\n"
+    )
+
+
+def generate_review(pr_info: dict, reviewer_prompt: str, context_tokens: int = REVIEW_CONTEXT_TOKENS,
+                    jobs: int = REVIEW_JOBS, shard: bool = True) -> dict:
+    """
+    Generate a code review using OpenAI.
+
+    If the diffs do not fit in context_tokens (and shard is set), the
+    pull request is reviewed in shards of about context_tokens each (see
+    review_shards), so the wall time is that of the slowest shard plus
+    the merge rather than the sum.
+    """
+    shards = plan_shards(pr_info['files_changed'], context_tokens - estimate_tokens(pr_info['body']) - 200) if shard else []
+
     try:
         client = OpenAI(api_key=OPENAI_API_KEY)
 
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": reviewer_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=OPENAI_MAX_TOKENS,
-            temperature=0.3  # Lower temperature for more consistent, focused reviews
-        )
+        if len(shards) > 1:
+            print(f"  Reviewing in {len(shards)} shards ({jobs} concurrent)")
+            review_content = review_shards(client, pr_info, reviewer_prompt, shards, context_tokens, jobs)
+        else:
+            # Build the context for the AI
+            pr_context = format_pr_context(pr_info, context_tokens)
+
+            user_message = f"""
+Please review the following pull request and provide comprehensive feedback:
 
-        review_content = response.choices[0].message.content
+{pr_context}
+{REVIEW_FOCUS}"""
+            review_content = request_review(client, reviewer_prompt, user_message)
 
         # Parse priority from review content
         priority = "MEDIUM"
@@ -162,6 +563,8 @@ Provide specific, actionable feedback with file names and line numbers where app
         return {
             'content': review_content,
             'priority': priority,
+            'head_sha': pr_info.get('head_sha'),
+            'since_sha': pr_info.get('since_sha'),
         }
 
     except Exception as e:
@@ -183,8 +586,13 @@ def post_review_to_pr(repo, pr_number: int, review_data: dict):
         }
 
         emoji = priority_emoji.get(review_data['priority'], 'ℹ️')
+        scope = ''
+        if review_data.get('since_sha'):
+            scope = f" (changes since {review_data['since_sha'][:7]})"
+        marker = REVIEW_MARKER.format(sha=review_data['head_sha']) if review_data.get('head_sha') else ''
 
-        comment_body = f"""## {emoji} AI Code Review - {review_data['priority']} Priority
+        comment_body = f"""{marker}
+## {emoji} AI Code Review{scope} - {review_data['priority']} Priority
 
 {review_data['content']}
 
@@ -239,9 +647,18 @@ def save_review_to_file(review_content: str, output_path: Path):
 @click.option('--pr', '-p', required=True, type=int, help='GitHub pull request number')
 @click.option('--output', '-o', type=click.Path(), help='Output file path (optional)')
 @click.option('--no-post', is_flag=True, help='Do not post to GitHub (local generation only)')
+@click.option('--context-tokens', default=REVIEW_CONTEXT_TOKENS, type=int,
+              help=f'Token budget for the PR description and diffs (default: {REVIEW_CONTEXT_TOKENS})')
+@click.option('--jobs', '-j', default=REVIEW_JOBS, type=int,
+              help=f'Shards of an oversized PR to review at once (default: {REVIEW_JOBS})')
+@click.option('--no-shard', is_flag=True, help='Review oversized PRs in one request, omitting lower-risk hunks')
+@click.option('--full', is_flag=True, help='Review the whole PR, not just the commits pushed since the last review')
+@click.option('--no-cache', is_flag=True, help='Call the API even if the same request was answered before')
 @click.option('--debug', is_flag=True, help='Enable debug output')
-def main(pr: int, output: str, no_post: bool, debug: bool):
+def main(pr: int, output: str, no_post: bool, context_tokens: int, jobs: int, no_shard: bool, full: bool, no_cache: bool, debug: bool):
     """Generate an automated code review for a GitHub pull request"""
+    if no_cache:
+        disable_cache_reads()
 
     # Validate environment
     if not OPENAI_API_KEY:
@@ -266,8 +683,9 @@ def main(pr: int, output: str, no_post: bool, debug: bool):
 
     # Connect to GitHub
     print(f"Fetching PR #{pr}...")
-    github_client = Github(GITHUB_TOKEN)
-    repo = github_client.get_repo(GITHUB_REPO)
+    github_client = Github(GITHUB_TOKEN, base_url=GITHUB_API_URL)
+    # Lazy: only later calls (comments, compare, posting) need the repository
+    repo = github_client.get_repo(GITHUB_REPO, lazy=True)
     pr_info = get_pr_info(repo, pr)
 
     print(f"✓ PR: {pr_info['title']}")
@@ -276,10 +694,28 @@ def main(pr: int, output: str, no_post: bool, debug: bool):
     print(f"  +{pr_info['additions']} -{pr_info['deletions']}")
     print()
 
+    # Only review what was pushed since the last posted review
+    if not full:
+        last_sha = get_last_reviewed_sha(repo, pr, REVIEWER_BOT_LOGIN)
+        if last_sha == pr_info['head_sha']:
+            print(f"✓ Head {last_sha[:7]} was already reviewed; nothing new to review (use --full to review again)")
+            return
+        if last_sha:
+            changes = get_changes_since(repo, pr_info, last_sha)
+            if changes:
+                pr_info = changes
+                print(f"Reviewing {pr_info['commits_since']} new commit(s) since {last_sha[:7]}:")
+                print(f"  Files changed: {pr_info['changed_files_count']}")
+                print(f"  +{pr_info['additions']} -{pr_info['deletions']}")
+                print()
+            else:
+                print("Reviewing the whole PR")
+                print()
+
     # Generate the review
     print("Generating code review with AI...")
     print("(This may take 30-60 seconds)")
-    review_data = generate_review(pr_info, reviewer_prompt)
+    review_data = generate_review(pr_info, reviewer_prompt, context_tokens, jobs, shard=not no_shard)
 
     print(f"✓ Generated review ({len(review_data['content'])} characters)")
     print(f"  Priority: {review_data['priority']}")
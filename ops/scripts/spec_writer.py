@@ -9,11 +9,14 @@ Usage:
 
 import os
 import sys
+import time
 import click
 from pathlib import Path
 from dotenv import load_dotenv
 from github import Github
 from openai import OpenAI
+from cost_ledger import record_usage
+from response_cache import create_cached, disable_cache_reads
 
 # Load environment variables
 load_dotenv()
@@ -86,7 +89,9 @@ Be specific, actionable, and thorough. Consider the existing CoStudy tech stack
     try:
         client = OpenAI(api_key=OPENAI_API_KEY)
 
-        response = client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            client.chat.completions,
             model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": spec_prompt},
@@ -95,6 +100,9 @@ Be specific, actionable, and thorough. Consider the existing CoStudy tech stack
             max_tokens=OPENAI_MAX_TOKENS,
             temperature=0.7
         )
+        response = raw.parse()
+        if not raw.cached:
+            record_usage("spec", OPENAI_MODEL, response.usage, "spec_writer", time.monotonic() - started, raw.retries_taken)
 
         spec_content = response.choices[0].message.content
         return spec_content
@@ -156,9 +164,12 @@ def save_spec_to_file(spec_content: str, output_path: Path):
 @click.option('--issue', '-i', required=True, type=int, help='GitHub issue number')
 @click.option('--output', '-o', type=click.Path(), help='Output file path (optional)')
 @click.option('--no-post', is_flag=True, help='Do not post to GitHub (local generation only)')
+@click.option('--no-cache', is_flag=True, help='Call the API even if the same request was answered before')
 @click.option('--debug', is_flag=True, help='Enable debug output')
-def main(issue: int, output: str, no_post: bool, debug: bool):
+def main(issue: int, output: str, no_post: bool, no_cache: bool, debug: bool):
     """Generate a technical specification from a GitHub issue"""
+    if no_cache:
+        disable_cache_reads()
 
     # Validate environment
     if not OPENAI_API_KEY:
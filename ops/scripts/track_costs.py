@@ -2,68 +2,580 @@
 """
 Cost Tracking Tool for AI Content Generation
 Analyzes all generated content and tracks spending
+
+Spend is read from the cost ledger the generators append to (see
+cost_ledger.py). Content created before the ledger's first record is
+still found by scanning the generated JSON files for that part of the
+range, and an empty ledger is ignored. Use --scan to parse the generated
+JSON files for the whole range instead. Scans keep the extracted
+cost of every file in output/cost-index.json and only parse files again
+when their modification time or size changed. Only the start of each
+file is read up to its cost and ai fields, which the generators write
+first, after the content_type of the artifact. The type of artifacts
+written before generators recorded it is guessed from the file name.
+
+Ledger reports are built from the daily rollups kept next to the ledger
+(see cost_ledger.py), so --since/--until ranges and --group-by trends
+over months of spend only read a few hundred rows. They also hold the
+p50/p95 latency, tokens/sec and retries per AI model shown in the report.
+
+--watch follows the ledger as it grows and alerts as soon as this
+month's spend crosses a share of the budget.
+
+--export writes CSV, or typed columns (timestamp date, float cost) to a
+Parquet or Arrow IPC file when it ends in .parquet, .arrow or .feather
+(requires pyarrow).
 """
 
 import os
+import re
+import csv
 import json
+import heapq
+import itertools
+import math
 import sys
-from datetime import datetime, timedelta
+import time
+import argparse
+import subprocess
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Dict, List
-
-def find_json_files(directory: str) -> List[Path]:
-    """Find all JSON files in directory recursively"""
-    path = Path(directory)
-    if not path.exists():
-        return []
-    return list(path.rglob("*.json"))
-
-def extract_cost(file_path: Path) -> Dict:
-    """Extract cost and metadata from JSON file"""
+from cost_ledger import COST_LEDGER_PATH, MONTHLY_BUDGET, RUN_IDLE_SECONDS, CostRollups, bucket_latency, iter_appended, iter_ledger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Paths
+SCRIPT_DIR = Path(__file__).parent
+OUTPUT_DIR = SCRIPT_DIR.parent / "output"
+COST_INDEX_PATH = OUTPUT_DIR / "cost-index.json"
+
+# Bump whenever the cost index entry layout changes so that files are parsed again
+COST_INDEX_FORMAT = 2
+
+# Characters read at a time when looking for the cost fields of a file
+READ_CHUNK_SIZE = 4 * 1024
+
+# Files handed to a worker process at a time with --workers
+WORKER_CHUNK_SIZE = 256
+
+# Rows buffered before they are written as one batch of a Parquet/Arrow export
+EXPORT_BATCH_SIZE = 64 * 1024
+
+# Export file extension -> format
+EXPORT_FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+
+# Estimated hours saved per content piece (rough averages)
+TIME_SAVED_HOURS = {
+    'blog': 5,
+    'spec': 4,
+    'proposal': 8,
+    'research': 8,
+    'review': 1,
+    'social': 0.5,
+    'image': 2,
+    'video': 3,
+    'unknown': 2
+}
+
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+def iter_json_files(directory: str):
+    """Yield (path, stat result) for every JSON file in directory recursively (paths start with directory)"""
+    pending = [directory]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith('.json') and entry.is_file():
+                        yield entry.path, entry.stat()
+        except OSError:
+            continue
+
+def cost_fields_known(fields: Dict) -> bool:
+    """Check whether more top-level fields could change the cost or ai read from a file"""
+    if 'ai' not in fields:
+        return False
+    # 'cost' wins over 'total_cost' unless it is missing or zero
+    return bool(fields.get('cost')) or ('cost' in fields and 'total_cost' in fields)
+
+def read_top_level_fields(file_path, done) -> Dict:
+    """
+    Read the top-level members of a JSON object file until done(fields) is
+    true or the object ends.
+
+    Members are decoded one at a time from the first READ_CHUNK_SIZE
+    characters, so the rest of the file is never read when done() is
+    satisfied there. Otherwise the whole file is decoded. Raises ValueError
+    if the file is not a JSON object.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read(READ_CHUNK_SIZE)
+        fields = {}
+        if len(text) == READ_CHUNK_SIZE:
+            pos = JSON_WHITESPACE.match(text).end() + 1
+            try:
+                if text[pos - 1] != '{':
+                    raise ValueError(f"{file_path} is not a JSON object")
+                while True:
+                    key, pos = JSON_DECODER.raw_decode(text, JSON_WHITESPACE.match(text, pos).end())
+                    pos = JSON_WHITESPACE.match(text, pos).end()
+                    if not isinstance(key, str) or text[pos] != ':':
+                        raise ValueError(f"{file_path} is not a JSON object")
+                    value, pos = JSON_DECODER.raw_decode(text, JSON_WHITESPACE.match(text, pos + 1).end())
+                    pos = JSON_WHITESPACE.match(text, pos).end()
+                    # Only use a member once its delimiter was read too, so
+                    # a number at the end of the chunk is not cut short
+                    if text[pos] not in ',}':
+                        raise ValueError(f"{file_path} is not a JSON object")
+                    fields[key] = value
+                    if done(fields):
+                        return fields
+                    pos += 1
+            except (ValueError, IndexError):
+                # A member continues past the chunk; decode the whole file
+                pass
+            text += f.read()
+
+    fields = json.loads(text)
+    if not isinstance(fields, dict):
+        raise ValueError(f"{file_path} is not a JSON object")
+    return fields
+
+def infer_content_type(file_path) -> str:
+    """Guess the content type of an artifact without a content_type field from its file name"""
+    name = os.path.basename(file_path).lower()
+    for content_type in ('blog', 'spec', 'image', 'video', 'social', 'research', 'proposal'):
+        if content_type in name:
+            return content_type
+    return 'unknown'
+
+def read_cost(file_path) -> Dict:
+    """Read cost, AI and content type from a JSON file (None if it cannot be parsed)"""
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        data = read_top_level_fields(file_path, cost_fields_known)
 
         # Try different cost fields
         cost = data.get('cost') or data.get('total_cost') or 0
 
         # Get metadata
         ai = data.get('ai', 'unknown')
-        content_type = 'unknown'
-
-        # Infer content type from file name
-        name = file_path.name.lower()
-        if 'blog' in name:
-            content_type = 'blog'
-        elif 'spec' in name:
-            content_type = 'spec'
-        elif 'image' in name:
-            content_type = 'image'
-        elif 'video' in name:
-            content_type = 'video'
-        elif 'social' in name:
-            content_type = 'social'
-        elif 'research' in name:
-            content_type = 'research'
-        elif 'proposal' in name:
-            content_type = 'proposal'
-
-        # Get file modification time
-        mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
+        content_type = data.get('content_type') or infer_content_type(file_path)
 
         return {
-            'file': str(file_path),
             'cost': float(cost),
             'ai': ai,
-            'type': content_type,
-            'date': mtime
+            'type': content_type
         }
     except Exception as e:
         return None
 
-def get_date_range(period: str) -> tuple:
-    """Get date range for period"""
+def read_costs(file_paths: List[str]) -> List[Dict]:
+    """Read the costs of several JSON files (one chunk of a --workers scan)"""
+    return [read_cost(file_path) for file_path in file_paths]
+
+class CostIndex:
+    """Costs read from generated files, reused while a file's modification time and size are unchanged."""
+
+    def __init__(self, path: Path = COST_INDEX_PATH):
+        self.path = path
+        # absolute path -> [mtime_ns, size, cost, ai, type]; cost is None
+        # for files that could not be parsed
+        self.entries = {}
+        self.dirty = False
+        if path:
+            self._load()
+
+    def _load(self):
+        """Read the index file, if there is a usable one"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') == COST_INDEX_FORMAT:
+            self.entries = data.get('files', {})
+
+    def save(self):
+        """Write the index file if any entry changed"""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': COST_INDEX_FORMAT, 'files': self.entries}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save cost index: {e}", file=sys.stderr)
+
+    def lookup(self, key: str, stat: os.stat_result) -> tuple:
+        """Get (True, cost item or None) for a file (key: its absolute path) that is unchanged since it was indexed, else (False, None)"""
+        entry = self.entries.get(key)
+        if not entry or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+            return False, None
+        if entry[2] is None:
+            return True, None
+        return True, {'cost': entry[2], 'ai': entry[3], 'type': entry[4]}
+
+    def store(self, key: str, stat: os.stat_result, item: Dict):
+        """Index the cost item read from a file (None if it could not be parsed)"""
+        if item is None:
+            self.entries[key] = [stat.st_mtime_ns, stat.st_size, None, None, None]
+        else:
+            self.entries[key] = [stat.st_mtime_ns, stat.st_size, item['cost'], item['ai'], item['type']]
+        self.dirty = True
+
+    def prune(self, directories: list, seen: set):
+        """Drop the entries of files in directories that were not seen by the last scan"""
+        roots = tuple(os.path.join(os.path.abspath(directory), '') for directory in directories)
+        for key in [key for key in self.entries if key.startswith(roots) and key not in seen]:
+            del self.entries[key]
+            self.dirty = True
+
+def iter_scanned_costs(directories: list, start: datetime, end: datetime, index: CostIndex = None, workers: int = 1):
+    """
+    Yield the cost items of the JSON files in directories modified between
+    start and end.
+
+    Files outside the date range are never opened. With an index, files
+    that did not change since the last scan are not parsed again either.
+    The other files are parsed in chunks of WORKER_CHUNK_SIZE as the scan
+    goes, by a pool of that many processes with workers > 1, so only a few
+    chunks are held at a time. The index is saved once the scan is done.
+    """
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    seen = set()
+
+    def parsed_items(chunk, parsed):
+        for (key, file_path, stat), item in zip(chunk, parsed):
+            if index:
+                index.store(key, stat, item)
+            if item:
+                item['file'] = file_path
+                item['date'] = datetime.fromtimestamp(stat.st_mtime)
+                yield item
+
+    pool = None
+    running = deque()  # (chunk, future) in submission order
+    chunk = []
+    try:
+        for directory in directories:
+            # Without a trailing separator, so that the keys match prune()'s roots
+            directory = os.path.normpath(directory)
+            root = os.path.abspath(directory)
+            for file_path, stat in iter_json_files(directory):
+                key = root + file_path[len(directory):]
+                seen.add(key)
+                if not start_ts <= stat.st_mtime <= end_ts:
+                    continue
+                found, item = index.lookup(key, stat) if index else (False, None)
+                if found:
+                    if item:
+                        item['file'] = file_path
+                        item['date'] = datetime.fromtimestamp(stat.st_mtime)
+                        yield item
+                    continue
+
+                chunk.append((key, file_path, stat))
+                if len(chunk) < WORKER_CHUNK_SIZE:
+                    continue
+                if workers > 1:
+                    pool = pool or ProcessPoolExecutor(max_workers=workers)
+                    running.append((chunk, pool.submit(read_costs, [path for _, path, _ in chunk])))
+                    if len(running) > 2 * workers:
+                        done, future = running.popleft()
+                        yield from parsed_items(done, future.result())
+                else:
+                    yield from parsed_items(chunk, read_costs([path for _, path, _ in chunk]))
+                chunk = []
+
+        while running:
+            done, future = running.popleft()
+            yield from parsed_items(done, future.result())
+        yield from parsed_items(chunk, read_costs([path for _, path, _ in chunk]))
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    if index:
+        index.prune(directories, seen)
+        index.save()
+
+def iter_ledger_items(ledger_path: Path, start: datetime, end: datetime, offset: int = 0, end_offset: int = None):
+    """
+    Yield one cost item per content piece from the cost ledger records
+    between start and end (read from byte offset to end_offset).
+
+    Calls of one generator run for the same content type (e.g. draft and
+    refinement) produced one piece of content. Only the pieces of runs
+    that wrote a record in the last RUN_IDLE_SECONDS (of ledger time) are
+    held open.
+    """
+    pieces = OrderedDict()  # (run, type) -> [time of last record, item], least recent first
+    for record in iter_ledger(ledger_path, start.timestamp(), end.timestamp(), offset, end_offset):
+        timestamp = record.get('time', 0)
+        while pieces:
+            key, (last, item) = next(iter(pieces.items()))
+            if timestamp - last <= RUN_IDLE_SECONDS:
+                break
+            del pieces[key]
+            yield item
+
+        content_type = record.get('type') or 'unknown'
+        cost = float(record.get('cost') or 0)
+        key = (record.get('run'), content_type)
+        if key in pieces:
+            piece = pieces[key]
+            piece[0] = timestamp
+            piece[1]['cost'] += cost
+            piece[1]['date'] = datetime.fromtimestamp(timestamp)
+            pieces.move_to_end(key)
+            continue
+
+        item = {
+            'file': record.get('source') or 'unknown',
+            'cost': cost,
+            'ai': record.get('ai') or 'unknown',
+            'type': content_type,
+            'date': datetime.fromtimestamp(timestamp)
+        }
+        if record.get('run'):
+            pieces[key] = [timestamp, item]
+        else:
+            yield item
+
+    for _, item in pieces.values():
+        yield item
+
+def ledger_start(ledger_path: Path) -> datetime:
+    """Get the time of the first cost ledger record (None if the ledger is missing or empty)"""
+    first = next(iter_ledger(ledger_path), None)
+    return datetime.fromtimestamp(first.get('time', 0)) if first else None
+
+def period_key(day: date, group_by: str) -> str:
+    """Get the --group-by period a day belongs to ('2024-05-17', the Monday of its week, or '2024-05')"""
+    if group_by == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if group_by == 'month':
+        return day.strftime('%Y-%m')
+    return day.isoformat()
+
+class CostSummary:
+    """Totals of a cost report, added up in one pass over the cost items with memory for the groups only."""
+
+    def __init__(self, recent: int = 5, group_by: str = None):
+        self.count = 0
+        self.total_cost = 0.0
+        self.time_saved = 0.0
+        self.by_type = {}
+        self.by_ai = {}
+        self.group_by = group_by
+        self.by_period = {}
+        self.recent_limit = recent
+        # Min-heap of (date, -position, item) holding the most recent items
+        self._recent = []
+        self._position = 0
+
+    def _count(self, day: date, content_type: str, ai: str, pieces: int, cost: float):
+        """Add pieces content pieces of one type and AI costing cost in total"""
+        self.count += pieces
+        self.total_cost += cost
+        self.time_saved += pieces * TIME_SAVED_HOURS.get(content_type, 2)
+
+        groups = [(self.by_type, content_type), (self.by_ai, ai)]
+        if self.group_by:
+            groups.append((self.by_period, period_key(day, self.group_by)))
+        for group, name in groups:
+            stats = group.get(name)
+            if stats is None:
+                stats = group[name] = {'count': 0, 'cost': 0}
+            stats['count'] += pieces
+            stats['cost'] += cost
+
+    def add(self, item: Dict, recent: bool = True):
+        """Add one cost item (to the totals only unless recent)"""
+        self._count(item['date'].date(), item['type'], item['ai'], 1, item['cost'])
+        if recent:
+            self.add_recent(item)
+
+    def add_rollup(self, day: date, content_type: str, ai: str, pieces: int, cost: float):
+        """Add a day's rollup of one content type and AI (see cost_ledger.CostRollups)"""
+        self._count(day, content_type, ai, pieces, cost)
+
+    def add_recent(self, item: Dict):
+        """Consider an item for the recent activity only"""
+        self._position += 1
+        # Earlier items win ties, like a stable sort would
+        entry = (item['date'], -self._position, item)
+        if len(self._recent) < self.recent_limit:
+            heapq.heappush(self._recent, entry)
+        elif entry[:2] > self._recent[0][:2]:
+            heapq.heapreplace(self._recent, entry)
+
+    def recent(self) -> List[Dict]:
+        """Get the most recent items, newest first"""
+        return [item for _, _, item in sorted(self._recent, key=lambda entry: entry[:2], reverse=True)]
+
+def add_ledger_rollups(summary: CostSummary, rollups: CostRollups, start: datetime, end: datetime):
+    """
+    Add the ledger spend between start and end to summary from the daily
+    rollups.
+
+    Whole days are taken from the rollups. A first day the range starts
+    partway through is read from the ledger, and so are the last days,
+    just enough of them to hold the recent activity.
+    """
+    days = list(rollups.iter_days(start.date(), end.date()))
+    for i, (day, entry) in enumerate(days):
+        if i == 0 and start > datetime.combine(day, datetime.min.time()):
+            end_offset = days[1][1]['offset'] if len(days) > 1 else None
+            for item in iter_ledger_items(rollups.ledger_path, start, end, entry['offset'], end_offset):
+                summary.add(item, recent=False)
+            continue
+        for content_type, by_ai in entry['groups'].items():
+            for ai, (pieces, cost) in by_ai.items():
+                summary.add_rollup(day, content_type, ai, pieces, cost)
+
+    pieces = 0
+    for first, (day, entry) in reversed(list(enumerate(days))):
+        pieces += sum(count for by_ai in entry['groups'].values() for count, _ in by_ai.values())
+        if pieces >= summary.recent_limit:
+            break
+    if days:
+        tail_start = max(start, datetime.combine(days[first][0], datetime.min.time()))
+        for item in iter_ledger_items(rollups.ledger_path, tail_start, end, days[first][1]['offset']):
+            summary.add_recent(item)
+
+def latency_percentile(histogram: Dict[int, int], q: float) -> float:
+    """Get the q-th percentile (0-100) of the latencies in a histogram of bucket -> calls"""
+    rank = math.ceil(q / 100 * sum(histogram.values()))
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return bucket_latency(bucket)
+    return 0.0
+
+def model_performance(rollups: CostRollups, start: datetime, end: datetime) -> Dict[str, Dict]:
+    """
+    Get calls, retries, p50/p95 latency (seconds) and completion tokens per
+    second for each AI model, from the rollups of the days from start to
+    end. Latency figures are None for models without timed calls.
+    """
+    merged = {}
+    for _, entry in rollups.iter_days(start.date(), end.date()):
+        for ai, calls in entry.get('calls', {}).items():
+            stats = merged.setdefault(ai, {'calls': 0, 'retries': 0, 'timed': 0, 'latency': 0.0, 'tokens_out': 0, 'histogram': {}})
+            for key in ('calls', 'retries', 'timed', 'latency', 'tokens_out'):
+                stats[key] += calls[key]
+            for bucket, count in calls['histogram'].items():
+                stats['histogram'][int(bucket)] = stats['histogram'].get(int(bucket), 0) + count
+
+    performance = {}
+    for ai, stats in merged.items():
+        timed = stats['timed'] > 0
+        performance[ai] = {
+            'calls': stats['calls'],
+            'retries': stats['retries'],
+            'p50': latency_percentile(stats['histogram'], 50) if timed else None,
+            'p95': latency_percentile(stats['histogram'], 95) if timed else None,
+            'tokens_per_second': stats['tokens_out'] / stats['latency'] if stats['tokens_out'] and stats['latency'] else None,
+        }
+    return performance
+
+def parse_day(value: str) -> date:
+    """Parse a YYYY-MM-DD command line date"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+class CsvExport:
+    """Writes cost items to a CSV file, one row at a time."""
+
+    def __init__(self, path: str):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=['date', 'type', 'ai', 'cost', 'file'])
+        self.writer.writeheader()
+
+    def write(self, item: Dict):
+        self.writer.writerow({
+            'date': item['date'].strftime('%Y-%m-%d %H:%M:%S'),
+            'type': item['type'],
+            'ai': item['ai'],
+            'cost': item['cost'],
+            'file': item['file']
+        })
+
+    def close(self):
+        self.file.close()
+
+class ArrowExport:
+    """Writes cost items to a Parquet or Arrow IPC file as typed columns, EXPORT_BATCH_SIZE rows at a time."""
+
+    def __init__(self, path: str, export_format: str):
+        self.schema = pa.schema([
+            ('date', pa.timestamp('us')),
+            ('type', pa.string()),
+            ('ai', pa.string()),
+            ('cost', pa.float64()),
+            ('file', pa.string()),
+        ])
+        if export_format == 'parquet':
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+        self.columns = {name: [] for name in self.schema.names}
+
+    def write(self, item: Dict):
+        for name, column in self.columns.items():
+            column.append(item[name])
+        if len(self.columns['date']) >= EXPORT_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        """Write the buffered rows as one record batch"""
+        if not self.columns['date']:
+            return
+        arrays = [pa.array(self.columns[field.name], type=field.type) for field in self.schema]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        for column in self.columns.values():
+            column.clear()
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            self.writer.close()
+
+def open_export(path: str):
+    """Open the export for path, in the format its extension names (CSV by default)"""
+    export_format = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if not export_format:
+        return CsvExport(path)
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError(f"pyarrow is required to export {export_format.capitalize()} files. Run: pip install pyarrow")
+    return ArrowExport(path, export_format)
+
+def get_date_range(period: str, since: date = None, until: date = None) -> tuple:
+    """Get date range for period, or from the start of since to the end of until"""
     now = datetime.now()
+    if since or until:
+        start = datetime.combine(since, datetime.min.time()) if since else datetime(2020, 1, 1)
+        end = datetime.combine(until, datetime.max.time()) if until else now
+        return start, end
 
     if period == 'today':
         start = now.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -83,66 +595,214 @@ def get_date_range(period: str) -> tuple:
 
     return start, end
 
-def main():
-    import argparse
+def parse_thresholds(value: str) -> List[float]:
+    """Parse comma-separated budget percentages"""
+    try:
+        thresholds = sorted(float(part) for part in value.split(',') if part.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid thresholds '{value}' (expected e.g. 50,80,100)")
+    if not thresholds or thresholds[0] <= 0:
+        raise argparse.ArgumentTypeError(f"invalid thresholds '{value}' (expected e.g. 50,80,100)")
+    return thresholds
+
+def send_alert(message: str, spent: float, budget: float, threshold: float, alert_command: str = None):
+    """Print a budget alert and run alert_command with the numbers in BUDGET_* environment variables"""
+    print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} {message}", flush=True)
+    if not alert_command:
+        return
+    env = {
+        **os.environ,
+        'BUDGET_MESSAGE': message,
+        'BUDGET_SPENT': f"{spent:.2f}",
+        'BUDGET_LIMIT': f"{budget:.2f}",
+        'BUDGET_THRESHOLD': f"{threshold:g}",
+    }
+    try:
+        subprocess.run(alert_command, shell=True, env=env, check=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Warning: Alert command failed: {e}", file=sys.stderr)
+
+def watch_budget(ledger_path: Path, budget: float, thresholds: List[float], interval: float, alert_command: str = None):
+    """
+    Follow the cost ledger and alert as soon as this month's spend crosses
+    one of thresholds (percentages of budget). Runs until interrupted.
+
+    Month-to-date spend starts from the daily rollups. After that only the
+    records appended since the last poll are read, into a running total
+    kept in memory.
+    """
+    def month_to_date():
+        rollups = CostRollups(ledger_path).update()
+        return rollups.spend(month, date.today()), rollups.size
+
+    month = date.today().replace(day=1)
+    spent, offset = month_to_date()
+    crossed = {threshold for threshold in thresholds if spent >= budget * threshold / 100}
+    print(f"👀 Watching {ledger_path} every {interval:g}s")
+    print(f"   Month to date: ${spent:.2f} of ${budget:.2f} ({spent / budget * 100:.1f}%)", flush=True)
+
+    while True:
+        time.sleep(interval)
+        if date.today().replace(day=1) != month:
+            month = date.today().replace(day=1)
+            spent = 0.0
+            crossed = set()
+            print(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 📅 New month, spend reset to $0.00", flush=True)
+
+        try:
+            size = os.path.getsize(ledger_path)
+        except OSError:
+            size = 0
+        if size < offset:
+            # The ledger was replaced or truncated: count it again
+            spent, offset = month_to_date()
+        else:
+            month_start = datetime.combine(month, datetime.min.time()).timestamp()
+            for offset, record in iter_appended(ledger_path, offset):
+                if record and record.get('time', 0) >= month_start:
+                    spent += float(record.get('cost') or 0)
+
+        for threshold in thresholds:
+            if threshold in crossed or spent < budget * threshold / 100:
+                continue
+            crossed.add(threshold)
+            icon = "🚨" if threshold >= 100 else "⚠️ "
+            message = f"{icon} Spend ${spent:.2f} crossed {threshold:g}% of the ${budget:.2f} monthly budget"
+            send_alert(message, spent, budget, threshold, alert_command)
 
+def main():
     parser = argparse.ArgumentParser(description="Track AI content generation costs")
     parser.add_argument('--period', choices=['today', 'week', 'month', 'all'], default='month',
                         help='Time period to analyze')
     parser.add_argument('--directory', default='content/generated',
                         help='Directory to scan for generated content')
-    parser.add_argument('--budget', type=float,
-                        help='Monthly budget to check against')
+    parser.add_argument('--budget', type=float, default=MONTHLY_BUDGET,
+                        help='Monthly budget to check against (default: MONTHLY_BUDGET)')
     parser.add_argument('--export', type=str,
-                        help='Export to CSV file')
+                        help='Export to CSV file (Parquet or Arrow for .parquet, .arrow or .feather files)')
+    parser.add_argument('--ledger', default=str(COST_LEDGER_PATH) if COST_LEDGER_PATH else None,
+                        help='Cost ledger written by the generators')
+    parser.add_argument('--scan', action='store_true',
+                        help='Parse the generated JSON files for the whole range instead of reading the cost ledger')
+    parser.add_argument('--index', default=str(COST_INDEX_PATH),
+                        help='Cost index used when scanning generated files')
+    parser.add_argument('--no-index', action='store_true',
+                        help='Parse every JSON file instead of reusing the cost index')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes parsing JSON files in parallel with --scan (default: 1)')
+    parser.add_argument('--since', type=parse_day,
+                        help='First day to analyze (YYYY-MM-DD, overrides --period)')
+    parser.add_argument('--until', type=parse_day,
+                        help='Last day to analyze (YYYY-MM-DD, overrides --period)')
+    parser.add_argument('--group-by', choices=['day', 'week', 'month'],
+                        help='Break spend down by day, week or month')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep following the ledger and alert when monthly spend crosses --thresholds of --budget')
+    parser.add_argument('--interval', type=float, default=10,
+                        help='Seconds between ledger polls with --watch (default: 10)')
+    parser.add_argument('--thresholds', type=parse_thresholds, default=[50, 80, 100],
+                        help='Budget percentages that alert with --watch (default: 50,80,100)')
+    parser.add_argument('--alert-command',
+                        help='Shell command run on each --watch alert (BUDGET_MESSAGE, BUDGET_SPENT, BUDGET_LIMIT, BUDGET_THRESHOLD are set)')
 
     args = parser.parse_args()
 
-    print("💰 AI Content Generation Cost Report")
-    print("=" * 60)
-    print()
-
-    # Find all JSON files
-    directories = [args.directory, 'specs', 'sales']
-    all_files = []
-    for directory in directories:
-        if os.path.exists(directory):
-            all_files.extend(find_json_files(directory))
-
-    if not all_files:
-        print("❌ No generated content found")
-        print(f"   Searched in: {', '.join(directories)}")
+    if args.watch:
+        if not args.budget or args.budget <= 0:
+            parser.error("--watch needs --budget (or MONTHLY_BUDGET)")
+        if not args.ledger:
+            parser.error("--watch needs a cost ledger")
+        print("💰 AI Content Generation Budget Watch")
+        print("=" * 60)
         print()
-        print("💡 Generate some content first:")
-        print("   ./ops/workflows/complete_content_package.sh \"Your Topic\"")
+        try:
+            watch_budget(Path(args.ledger), args.budget, args.thresholds, args.interval, args.alert_command)
+        except KeyboardInterrupt:
+            print()
+            print("👋 Stopped watching")
         return
 
-    # Extract costs
-    items = []
-    for file_path in all_files:
-        item = extract_cost(file_path)
-        if item:
-            items.append(item)
+    print("💰 AI Content Generation Cost Report")
+    print("=" * 60)
+    print()
 
-    if not items:
-        print("❌ No cost data found in JSON files")
-        return
+    start_date, end_date = get_date_range(args.period, args.since, args.until)
+    custom_range = bool(args.since or args.until)
+    period_name = 'custom range' if custom_range else args.period
+    ledger_path = Path(args.ledger) if args.ledger else None
+    summary = CostSummary(group_by=args.group_by)
+    performance = None
+
+    ledger_begins = ledger_start(ledger_path) if ledger_path and not args.scan else None
+    if ledger_path and ledger_path.exists() and not args.scan and not ledger_begins:
+        print(f"Warning: Cost ledger {ledger_path} has no records, scanning generated files instead", file=sys.stderr)
+
+    directories = [directory for directory in [args.directory, 'specs', 'sales'] if os.path.exists(directory)]
+    index = None if args.no_index else CostIndex(Path(args.index))
+
+    if ledger_begins:
+        rollups = CostRollups(ledger_path).update()
+        performance = model_performance(rollups, start_date, end_date)
+        if args.export:
+            # Every piece is exported: read the ledger from the first day of the range
+            items = iter_ledger_items(ledger_path, start_date, end_date, rollups.offset(start_date.date()))
+        else:
+            add_ledger_rollups(summary, rollups, start_date, end_date)
+            items = ()
+        source = str(ledger_path)
+
+        # Content generated before the ledger existed only has its cost in
+        # the generated files
+        if start_date < ledger_begins and directories:
+            scan_end = min(end_date, ledger_begins - timedelta(microseconds=1))
+            items = itertools.chain(iter_scanned_costs(directories, start_date, scan_end, index, args.workers), items)
+            source += f" (before {ledger_begins.strftime('%Y-%m-%d %H:%M')}: {', '.join(directories)})"
+    else:
+        if not directories:
+            print("❌ No generated content found")
+            print(f"   Searched in: {', '.join([args.directory, 'specs', 'sales'])}")
+            print()
+            print("💡 Generate some content first:")
+            print("   ./ops/workflows/complete_content_package.sh \"Your Topic\"")
+            return
 
-    # Filter by date range
-    start_date, end_date = get_date_range(args.period)
-    filtered_items = [item for item in items if start_date <= item['date'] <= end_date]
+        # Files are filtered by modification date before they are parsed
+        items = iter_scanned_costs(directories, start_date, end_date, index, args.workers)
+        source = ', '.join(directories)
 
-    if not filtered_items:
-        print(f"❌ No content generated in {args.period}")
+    # One pass over the items: totals, breakdowns, recent activity and the
+    # export are all built as the items stream in
+    try:
+        export = open_export(args.export) if args.export else None
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    try:
+        for item in items:
+            summary.add(item)
+            if export:
+                export.write(item)
+    finally:
+        if export:
+            export.close()
+
+    if not summary.count:
+        if export:
+            os.unlink(args.export)
+        if ledger_begins:
+            print(f"❌ No content generated in {period_name}")
+        else:
+            print(f"❌ No cost data found in JSON files ({period_name})")
         return
 
     # Calculate totals
-    total_cost = sum(item['cost'] for item in filtered_items)
-    total_items = len(filtered_items)
+    total_cost = summary.total_cost
+    total_items = summary.count
 
-    print(f"📅 Period: {args.period.capitalize()}")
+    print(f"📅 Period: {period_name.capitalize()}")
     print(f"   From: {start_date.strftime('%Y-%m-%d')}")
     print(f"   To:   {end_date.strftime('%Y-%m-%d')}")
+    print(f"   Source: {source}")
     print()
 
     print(f"📊 Summary:")
@@ -152,36 +812,44 @@ def main():
     print()
 
     # Breakdown by content type
-    by_type = {}
-    for item in filtered_items:
-        content_type = item['type']
-        if content_type not in by_type:
-            by_type[content_type] = {'count': 0, 'cost': 0}
-        by_type[content_type]['count'] += 1
-        by_type[content_type]['cost'] += item['cost']
-
     print("📈 By Content Type:")
-    for content_type, stats in sorted(by_type.items(), key=lambda x: x[1]['cost'], reverse=True):
+    for content_type, stats in sorted(summary.by_type.items(), key=lambda x: x[1]['cost'], reverse=True):
         print(f"   {content_type.capitalize()}: {stats['count']} items, ${stats['cost']:.2f}")
     print()
 
     # Breakdown by AI
-    by_ai = {}
-    for item in filtered_items:
-        ai = item['ai']
-        if ai not in by_ai:
-            by_ai[ai] = {'count': 0, 'cost': 0}
-        by_ai[ai]['count'] += 1
-        by_ai[ai]['cost'] += item['cost']
-
     print("🤖 By AI Model:")
-    for ai, stats in sorted(by_ai.items(), key=lambda x: x[1]['cost'], reverse=True):
+    for ai, stats in sorted(summary.by_ai.items(), key=lambda x: x[1]['cost'], reverse=True):
         print(f"   {ai}: {stats['count']} items, ${stats['cost']:.2f}")
     print()
 
+    # Speed of each AI model (ledger only: artifacts don't record single calls)
+    if performance:
+        print("⚡ Performance by AI Model:")
+        for ai, stats in sorted(performance.items(), key=lambda x: x[1]['calls'], reverse=True):
+            line = f"   {ai}: {stats['calls']} calls"
+            if stats['p50'] is None:
+                line += ", latency not recorded"
+            else:
+                line += f", p50 {stats['p50']:.1f}s, p95 {stats['p95']:.1f}s"
+            if stats['tokens_per_second'] is not None:
+                line += f", {stats['tokens_per_second']:.0f} tokens/s"
+            if stats['retries']:
+                line += f", {stats['retries']} retries"
+            print(line)
+        print()
+
+    # Breakdown by day, week or month
+    if args.group_by:
+        print(f"📆 By {args.group_by.capitalize()}:")
+        for key, stats in sorted(summary.by_period.items()):
+            label = f"Week of {key}" if args.group_by == 'week' else key
+            print(f"   {label}: {stats['count']} items, ${stats['cost']:.2f}")
+        print()
+
     # Budget check
     if args.budget:
-        if args.period == 'month':
+        if args.period == 'month' and not custom_range:
             percentage = (total_cost / args.budget) * 100
             remaining = args.budget - total_cost
 
@@ -199,21 +867,7 @@ def main():
             print()
 
     # ROI calculation
-    # Estimate time saved (rough averages)
-    time_saved_hours = {
-        'blog': 5,
-        'spec': 4,
-        'proposal': 8,
-        'research': 8,
-        'social': 0.5,
-        'image': 2,
-        'video': 3,
-        'unknown': 2
-    }
-
-    total_time_saved = sum(
-        time_saved_hours.get(item['type'], 2) for item in filtered_items
-    )
+    total_time_saved = summary.time_saved
 
     value_at_50_per_hour = total_time_saved * 50
     roi = ((value_at_50_per_hour - total_cost) / total_cost * 100) if total_cost > 0 else 0
@@ -227,28 +881,14 @@ def main():
     print()
 
     # Recent activity
-    recent = sorted(filtered_items, key=lambda x: x['date'], reverse=True)[:5]
     print("📅 Recent Activity (last 5):")
-    for item in recent:
+    for item in summary.recent():
         date_str = item['date'].strftime('%Y-%m-%d %H:%M')
         file_name = Path(item['file']).name
         print(f"   {date_str} | {item['type']:12} | ${item['cost']:5.2f} | {file_name}")
     print()
 
-    # Export to CSV
     if args.export:
-        import csv
-        with open(args.export, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=['date', 'type', 'ai', 'cost', 'file'])
-            writer.writeheader()
-            for item in filtered_items:
-                writer.writerow({
-                    'date': item['date'].strftime('%Y-%m-%d %H:%M:%S'),
-                    'type': item['type'],
-                    'ai': item['ai'],
-                    'cost': item['cost'],
-                    'file': item['file']
-                })
         print(f"✅ Exported to {args.export}")
         print()
 
@@ -32,11 +32,14 @@ Usage:
 import os
 import sys
 import json
+import time
 import argparse
 import requests
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from openai import OpenAI
+from cost_ledger import MONTHLY_BUDGET, CostTracker, budget_allows
+from response_cache import create_cached, disable_cache_reads
 
 try:
     from anthropic import Anthropic
@@ -65,13 +68,29 @@ COSTS = {
     "elevenlabs": 0.0003,  # per character
 }
 
-class UltimateContentGenerator:
+# Typical cost of one piece, checked against MONTHLY_BUDGET before ensemble runs
+ESTIMATED_COSTS = {
+    "blog-claude": 1.50,  # 2 passes
+    "blog-gpt4": 0.80,  # 2 passes
+    "research": 0.005,
+}
+
+# Content type of an ensemble's output, by the AI that won
+ENSEMBLE_CONTENT_TYPES = {
+    "claude": "blog",
+    "gpt4": "blog",
+    "perplexity": "research",
+}
+
+class UltimateContentGenerator(CostTracker):
     """The ULTIMATE content generator - best AI for every task."""
 
+    COST_SOURCE = "ultimate_content_generator"
+
     def __init__(self):
+        super().__init__()
         self.openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
         self.anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY) if ANTHROPIC_AVAILABLE and ANTHROPIC_API_KEY else None
-        self.total_cost = 0.0
 
     def select_best_ai(self, task_type: str, mode: str = "ultimate") -> str:
         """Auto-select the best AI for the task."""
@@ -139,7 +158,9 @@ Format as JSON with all required fields."""
 
         # FIRST PASS with Claude
         print("   Pass 1: Claude Opus draft...")
-        response = self.anthropic_client.messages.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.anthropic_client.messages,
             model="claude-3-opus-20240229",
             max_tokens=8000,
             temperature=0.9,  # High creativity
@@ -148,20 +169,23 @@ Format as JSON with all required fields."""
                 "content": prompt
             }]
         )
+        response = raw.parse()
 
         content = response.content[0].text
         input_tokens = response.usage.input_tokens
         output_tokens = response.usage.output_tokens
 
-        cost = self._calculate_cost_anthropic(input_tokens, output_tokens)
-        self.total_cost += cost
+        cost = 0.0 if raw.cached else self._calculate_cost_anthropic(input_tokens, output_tokens)
+        self._add_cost(cost, "blog", "claude-opus", input_tokens, output_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
         print(f"   ✅ Claude draft complete ({output_tokens} tokens, ${cost:.4f})")
 
         # SECOND PASS: Refinement with Claude
         print("   Pass 2: Claude Opus refinement...")
 
-        refinement = self.anthropic_client.messages.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.anthropic_client.messages,
             model="claude-3-opus-20240229",
             max_tokens=8000,
             temperature=0.3,  # More precise
@@ -183,13 +207,14 @@ Make it:
 Return improved version in same JSON format."""
             }]
         )
+        refinement = raw.parse()
 
         refined_content = refinement.content[0].text
-        refine_cost = self._calculate_cost_anthropic(
+        refine_cost = 0.0 if raw.cached else self._calculate_cost_anthropic(
             refinement.usage.input_tokens,
             refinement.usage.output_tokens
         )
-        self.total_cost += refine_cost
+        self._add_cost(refine_cost, "blog", "claude-opus", refinement.usage.input_tokens, refinement.usage.output_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
         cost += refine_cost
 
         print(f"   ✅ Claude refinement complete (+${refine_cost:.4f})")
@@ -225,6 +250,7 @@ Provide:
 
 IMPORTANT: Include citations and sources for all claims."""
 
+        started = time.monotonic()
         response = requests.post(
             "https://api.perplexity.ai/chat/completions",
             headers={
@@ -250,7 +276,7 @@ IMPORTANT: Include citations and sources for all claims."""
         citations = data.get('citations', [])
 
         cost = 0.005  # Approximate per query
-        self.total_cost += cost
+        self._add_cost(cost, "research", "perplexity-pro", latency=time.monotonic() - started)
 
         print(f"   ✅ Research complete with {len(citations)} citations (${cost:.4f})")
 
@@ -279,6 +305,7 @@ high detail, rule of thirds composition --ar 16:9 --style raw --v 6"""
         # Note: This requires unofficial Midjourney API service
         # Example: https://github.com/erictik/midjourney-api
         try:
+            started = time.monotonic()
             response = requests.post(
                 f"{os.getenv('MIDJOURNEY_API_URL', 'https://api.midjourney.com')}/imagine",
                 headers={"Authorization": f"Bearer {MIDJOURNEY_API_KEY}"},
@@ -288,7 +315,7 @@ high detail, rule of thirds composition --ar 16:9 --style raw --v 6"""
             if response.status_code == 200:
                 data = response.json()
                 cost = 0.20  # Fast mode
-                self.total_cost += cost
+                self._add_cost(cost, "image", "midjourney-v6", latency=time.monotonic() - started)
 
                 print(f"   ✅ Midjourney image generated (${cost:.4f})")
 
@@ -314,7 +341,8 @@ PREMIUM QUALITY: Award-winning photography, professional lighting,
 sophisticated color palette, high detail, modern educational technology aesthetic,
 inspiring collaborative mood, Fortune-100 marketing quality"""
 
-        response = self.openai_client.images.generate(
+        started = time.monotonic()
+        raw = self.openai_client.images.with_raw_response.generate(
             model="dall-e-3",
             prompt=enhanced_prompt,
             size="1792x1024",
@@ -322,9 +350,10 @@ inspiring collaborative mood, Fortune-100 marketing quality"""
             style="natural",
             n=1
         )
+        response = raw.parse()
 
         cost = 0.08 if quality == "hd" else 0.04
-        self.total_cost += cost
+        self._add_cost(cost, "image", f"dalle3-{quality}", latency=time.monotonic() - started, retries=raw.retries_taken)
 
         print(f"   ✅ DALL-E 3 {quality.upper()} image generated (${cost:.4f})")
 
@@ -345,10 +374,14 @@ inspiring collaborative mood, Fortune-100 marketing quality"""
             print("❌ Runway API key required for video generation")
             return {"error": "Runway API key required"}
 
+        if not self._within_budget(duration * COSTS["runway"]):
+            return {"error": "Monthly budget exceeded"}
+
         enhanced_prompt = f"""{prompt}, professional quality, smooth camera movement,
 modern educational technology, inspiring collaborative atmosphere, 4K quality"""
 
         try:
+            started = time.monotonic()
             response = requests.post(
                 "https://api.runwayml.com/v1/generate",
                 headers={
@@ -365,7 +398,7 @@ modern educational technology, inspiring collaborative atmosphere, 4K quality"""
             if response.status_code == 200:
                 data = response.json()
                 cost = duration * 0.05  # $0.05 per second
-                self.total_cost += cost
+                self._add_cost(cost, "video", "runway-gen2", latency=time.monotonic() - started)
 
                 print(f"   ✅ Runway video generated ({duration}sec, ${cost:.4f})")
 
@@ -390,6 +423,7 @@ modern educational technology, inspiring collaborative atmosphere, 4K quality"""
             return {"error": "ElevenLabs API key required"}
 
         try:
+            started = time.monotonic()
             response = requests.post(
                 f"https://api.elevenlabs.io/v1/text-to-speech/{voice}",
                 headers={
@@ -409,7 +443,7 @@ modern educational technology, inspiring collaborative atmosphere, 4K quality"""
             if response.status_code == 200:
                 audio_data = response.content
                 cost = len(text) * 0.0003
-                self.total_cost += cost
+                self._add_cost(cost, "voice", "elevenlabs", latency=time.monotonic() - started)
 
                 print(f"   ✅ Voice generated ({len(text)} chars, ${cost:.4f})")
 
@@ -465,7 +499,9 @@ Format as JSON with all required fields."""
 
         # FIRST PASS with GPT-4
         print("   Pass 1: GPT-4 Turbo draft...")
-        response = self.openai_client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.openai_client.chat.completions,
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a WORLD-CLASS content marketer for Fortune-100 companies."},
@@ -474,20 +510,23 @@ Format as JSON with all required fields."""
             temperature=0.9,
             max_tokens=8000
         )
+        response = raw.parse()
 
         content = response.choices[0].message.content
         input_tokens = response.usage.prompt_tokens
         output_tokens = response.usage.completion_tokens
 
-        cost = self._calculate_cost_openai(input_tokens, output_tokens)
-        self.total_cost += cost
+        cost = 0.0 if raw.cached else self._calculate_cost_openai(input_tokens, output_tokens)
+        self._add_cost(cost, "blog", "gpt-4-turbo", input_tokens, output_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
 
         print(f"   ✅ GPT-4 draft complete ({output_tokens} tokens, ${cost:.4f})")
 
         # SECOND PASS: Refinement
         print("   Pass 2: GPT-4 Turbo refinement...")
 
-        refinement = self.openai_client.chat.completions.create(
+        started = time.monotonic()
+        raw = create_cached(
+            self.openai_client.chat.completions,
             model="gpt-4-turbo-preview",
             messages=[
                 {"role": "system", "content": "You are a senior editor at a Fortune 100 company."},
@@ -507,13 +546,14 @@ Return improved version in same JSON format."""}
             temperature=0.3,
             max_tokens=8000
         )
+        refinement = raw.parse()
 
         refined_content = refinement.choices[0].message.content
-        refine_cost = self._calculate_cost_openai(
+        refine_cost = 0.0 if raw.cached else self._calculate_cost_openai(
             refinement.usage.prompt_tokens,
             refinement.usage.completion_tokens
         )
-        self.total_cost += refine_cost
+        self._add_cost(refine_cost, "blog", "gpt-4-turbo", refinement.usage.prompt_tokens, refinement.usage.completion_tokens, latency=time.monotonic() - started, retries=raw.retries_taken, cached=raw.cached)
         cost += refine_cost
 
         print(f"   ✅ GPT-4 refinement complete (+${refine_cost:.4f})")
@@ -536,6 +576,10 @@ Return improved version in same JSON format."""}
         results = []
 
         if content_type == "blog":
+            estimate = ESTIMATED_COSTS["blog-claude"] + ESTIMATED_COSTS["blog-gpt4"] + ESTIMATED_COSTS["research"]
+            if not self._within_budget(estimate):
+                return {"error": "Monthly budget exceeded", "ensemble_mode": True}
+
             topic = kwargs.get("topic")
             keywords = kwargs.get("keywords", [])
 
@@ -570,6 +614,7 @@ Return improved version in same JSON format."""}
         print("=" * 60)
 
         return {
+            "content_type": ENSEMBLE_CONTENT_TYPES[winner_name],
             "winner": winner_name,
             "content": winner_result,
             "all_results": scored_results,
@@ -593,6 +638,13 @@ Return improved version in same JSON format."""}
 
         return min(score, 100)
 
+    def _within_budget(self, estimated_cost: float) -> bool:
+        """Check the monthly budget before a call estimated to cost estimated_cost."""
+        if budget_allows(estimated_cost):
+            return True
+        print(f"❌ Monthly budget of ${MONTHLY_BUDGET:.2f} would be exceeded (estimated ${estimated_cost:.2f})")
+        return False
+
     def _calculate_cost_anthropic(self, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost for Anthropic API."""
         input_cost = (input_tokens / 1000) * COSTS["claude-opus"]["input"]
@@ -634,6 +686,7 @@ Return improved version in same JSON format."""}
 
 def main():
     parser = argparse.ArgumentParser(description="Ultimate Fortune-100 Content Generator")
+    parser.add_argument("--no-cache", action="store_true", help="Call the APIs even if the same request was answered before")
     subparsers = parser.add_subparsers(dest="command", help="Content type")
 
     # Blog post
@@ -673,6 +726,9 @@ def main():
         parser.print_help()
         sys.exit(1)
 
+    if args.no_cache:
+        disable_cache_reads()
+
     generator = UltimateContentGenerator()
 
     try:
@@ -702,9 +758,20 @@ def main():
         elif args.command == "voice":
             result = generator.generate_voice_elevenlabs(args.text, args.voice)
 
-        # Save output
+        # Save output; the metadata goes first, ending with cost and ai,
+        # so track_costs.py can stop reading there. The run's totals
+        # replace the cost of the result's last call
+        header = {
+            "content_type": result.get("content_type", args.command),
+            "tokens_in": generator.total_tokens_in,
+            "tokens_out": generator.total_tokens_out,
+            "latency": round(generator.total_latency, 3),
+            "cost": generator.total_cost,
+            "ai": result.get("ai", "multiple"),
+        }
+        content = {key: value for key, value in result.items() if key not in header}
         with open(args.output, "w") as f:
-            json.dump(result, f, indent=2)
+            json.dump({**header, **content}, f, indent=2)
 
         print(f"\n✅ Content saved to: {args.output}")
         print(f"💰 Total cost: ${generator.total_cost:.4f}")